@@ -0,0 +1,107 @@
+"""Benchmark the scan -> propose -> solve -> PR pipeline against local stand-ins.
+
+Usage: python -m bench --instances 50 --repos 5 --concurrency 4
+
+The market API, GitHub and the agent container are replaced by local fakes, and git runs
+against bare repositories in a temporary directory, so no credentials or network are used.
+"""
+
+import argparse
+import json
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+from loguru import logger
+
+from .fakes import PLACEHOLDER_SETTINGS
+from .market_simulator import add_fault_arguments, simulator_from_args
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(prog="python -m bench", description=__doc__.split("\n")[0])
+    parser.add_argument("--instances", type=int, default=20, help="Open instances in the market.")
+    parser.add_argument("--repos", type=int, default=4, help="Distinct upstream repositories.")
+    parser.add_argument("--concurrency", type=int, default=4, help="MAX_CONCURRENT_SOLVES.")
+    parser.add_argument(
+        "--agent-seconds", type=float, default=0.0, help="Simulated agent run time per solve."
+    )
+    parser.add_argument(
+        "--cycle-interval", type=float, default=0.05, help="Pause between handler cycles."
+    )
+    parser.add_argument("--timeout", type=float, default=600.0, help="Give up after this long.")
+    parser.add_argument(
+        "--no-mirror", action="store_true", help="Clone directly instead of through mirrors."
+    )
+    parser.add_argument(
+        "--clone-strategy",
+        choices=["full", "shallow", "blobless", "treeless"],
+        default="full",
+        help="CLONE_STRATEGY; auto needs the GitHub API so it is not offered.",
+    )
+    parser.add_argument(
+        "--http-market",
+        action="store_true",
+        help="Serve the market over localhost with the simulator instead of in process.",
+    )
+    parser.add_argument(
+        "--scan-only", action="store_true", help="Only run the market scan and proposals."
+    )
+    add_fault_arguments(parser)
+    parser.add_argument("--json", action="store_true", help="Print the report as JSON.")
+    parser.add_argument("--log-level", default="WARNING", help="Log level of the pipeline.")
+    return parser.parse_args()
+
+
+def _bench_environment(workdir: Path, args: argparse.Namespace) -> dict[str, str]:
+    """Settings for the run. Credentials are placeholders so real ones can never be used."""
+    return {
+        **PLACEHOLDER_SETTINGS,
+        "MAX_CONCURRENT_SOLVES": str(args.concurrency),
+        "GIT_MIRROR_CACHE_ENABLED": str(not args.no_mirror).lower(),
+        "GIT_MIRROR_CACHE_DIR": str(workdir / "mirrors"),
+        "CLONE_STRATEGY": args.clone_strategy,
+        "GITHUB_RATE_LIMIT_DB": str(workdir / "github_rate_limit.sqlite3"),
+        "INSTANCE_STORE_DB": str(workdir / "instances.sqlite3"),
+        "CONTAINER_LOG_DIR": str(workdir / "container-logs"),
+        "WARM_POOL_SIZE": "0",
+        "PRE_PULL_IMAGES": "false",
+        "LLM_CACHE_ENABLED": "false",
+        "MODEL_PRICES_SNAPSHOT": str(workdir / "model_prices.json"),
+        "GIT_AUTHOR_NAME": "bench-bot",
+        "GIT_AUTHOR_EMAIL": "bench-bot@example.com",
+        "GIT_COMMITTER_NAME": "bench-bot",
+        "GIT_COMMITTER_EMAIL": "bench-bot@example.com",
+    }
+
+
+def main() -> None:
+    args = _parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level=args.log_level)
+
+    with tempfile.TemporaryDirectory(prefix="agent-market-bench-") as workdir:
+        os.environ.update(_bench_environment(Path(workdir), args))
+
+        from .harness import run_benchmark
+        from .metrics import format_report
+
+        report = run_benchmark(
+            Path(workdir),
+            instance_count=args.instances,
+            repo_count=args.repos,
+            agent_seconds=args.agent_seconds,
+            cycle_interval=args.cycle_interval,
+            timeout=args.timeout,
+            scan_only=args.scan_only,
+            simulator_factory=(
+                (lambda market: simulator_from_args(market, args)) if args.http_market else None
+            ),
+        )
+
+    print(json.dumps(report, indent=2) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
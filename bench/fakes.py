@@ -0,0 +1,315 @@
+import json
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
+
+import git
+import httpx
+
+BENCH_TOKEN = "bench-token"
+UPSTREAM_OWNER = "bench-owner"
+FORK_OWNER = "bench-bot"
+
+# Required settings, as placeholders so that real credentials can never be used.
+PLACEHOLDER_SETTINGS = {
+    "OPENROUTER_API_KEY": "bench",
+    "OPENAI_API_KEY": "bench",
+    "GITHUB_PAT": BENCH_TOKEN,
+    "GITHUB_USERNAME": "bench-bot",
+    "GITHUB_EMAIL": "bench-bot@example.com",
+    "AWS_REGION_NAME": "us-east-1",
+    "AWS_ACCESS_KEY_ID": "bench",
+    "AWS_SECRET_ACCESS_KEY": "bench",
+    "MARKET_URL": "http://market.bench",
+    "MARKET_API_KEY": "bench",
+    "AGENT_TYPE": "aider",
+    "FOUNDATION_MODEL_NAME": "gpt-4o",
+    "PROVIDER": "openai",
+}
+
+# Not part of the live market API; lets MARKET_PROPOSAL_BATCH_PATH be exercised locally.
+BATCH_PROPOSAL_PATH = "/v1/proposals/create/batch"
+_PROPOSAL_PATH = re.compile(r"^/v1/proposals/create/for-instance/(?P<id>[^/]+)$")
+_INSTANCE_PATH = re.compile(r"^/v1/instances/(?P<id>[^/]+)$")
+_CHAT_PATH = re.compile(r"^/v1/chat/(?P<id>[^/]+)$")
+_MESSAGE_PATH = re.compile(r"^/v1/chat/send-message/(?P<id>[^/]+)$")
+_ROUTES = [
+    (_PROPOSAL_PATH, "/v1/proposals/create/for-instance/{id}"),
+    (_MESSAGE_PATH, "/v1/chat/send-message/{id}"),
+    (_CHAT_PATH, "/v1/chat/{id}"),
+    (_INSTANCE_PATH, "/v1/instances/{id}"),
+]
+
+
+def route_template(path: str) -> str:
+    """Return ``path`` with instance ids replaced by ``{id}``, for per-endpoint counters."""
+    for pattern, template in _ROUTES:
+        if pattern.match(path):
+            return template
+    return path
+
+
+class FakeMarket:
+    """In-memory market that awards every proposal as soon as it is created."""
+
+    def __init__(
+        self,
+        instance_count: int,
+        repo_count: int,
+        open_code: int,
+        resolved_code: int,
+        awarded_code: int,
+    ):
+        self._lock = threading.Lock()
+        self._resolved_code = resolved_code
+        self._awarded_code = awarded_code
+        self.instances = {
+            f"bench-{i}": {
+                "id": f"bench-{i}",
+                "status": open_code,
+                "max_credit_per_instance": 1.0,
+                "background": (
+                    f"Add a greeting to https://github.com/{UPSTREAM_OWNER}/repo-{i % repo_count}"
+                ),
+            }
+            for i in range(instance_count)
+        }
+        self.proposals: dict[str, dict] = {}
+        self.chats: dict[str, list[dict]] = {instance_id: [] for instance_id in self.instances}
+        self.awarded_at: dict[str, float] = {}
+        self.reported_at: dict[str, float] = {}
+
+    def seed_proposals(self, count: int) -> None:
+        """Mark the first ``count`` instances as already proposed for and awarded."""
+        with self._lock:
+            for instance_id in list(self.instances)[:count]:
+                self._create_proposal(instance_id, {"max_bid": 0.03})
+
+    def seed_chats(self, messages_per_instance: int) -> None:
+        """Give every instance a requester conversation of ``messages_per_instance`` messages."""
+        with self._lock:
+            for instance_id, chat in self.chats.items():
+                chat.extend(
+                    {
+                        "sender": "requester",
+                        "message": f"Message {index} about {instance_id}",
+                        "timestamp": datetime.utcnow().isoformat(),
+                    }
+                    for index in range(messages_per_instance)
+                )
+
+    def handle(
+        self, method: str, path: str, params: dict, body: Optional[dict]
+    ) -> tuple[int, object]:
+        """Serve a market API request, returning the status code and JSON payload."""
+        with self._lock:
+            if method == "GET" and path == "/v1/instances/":
+                status = params.get("instance_status")
+                return 200, [
+                    instance
+                    for instance in self.instances.values()
+                    if status is None or str(instance["status"]) == str(status)
+                ]
+            if method == "GET" and path == "/v1/proposals/":
+                return 200, list(self.proposals.values())
+
+            if method == "POST" and path == BATCH_PROPOSAL_PATH:
+                results = [
+                    self._create_proposal(proposal["instance_id"], proposal)
+                    for proposal in (body or {}).get("proposals", [])
+                ]
+                return 200, [{"status": status, "detail": payload} for status, payload in results]
+            if method == "POST" and (match := _PROPOSAL_PATH.match(path)):
+                return self._create_proposal(match["id"], body or {})
+            if method == "POST" and (match := _MESSAGE_PATH.match(path)):
+                return self._send_message(match["id"], body or {})
+            if method == "GET" and (match := _INSTANCE_PATH.match(path)):
+                instance = self.instances.get(match["id"])
+                return (200, instance) if instance else (404, {"detail": "Not found"})
+            if method == "GET" and (match := _CHAT_PATH.match(path)):
+                return 200, self.chats.get(match["id"], [])
+
+        return 404, {"detail": f"No route for {method} {path}"}
+
+    def _create_proposal(self, instance_id: str, body: dict) -> tuple[int, object]:
+        instance = self.instances.get(instance_id)
+        if instance is None:
+            return 404, {"detail": "Not found"}
+        if instance_id in self.proposals:
+            return 409, {"detail": "Proposal already exists"}
+
+        self.proposals[instance_id] = {
+            "id": f"proposal-{instance_id}",
+            "instance_id": instance_id,
+            "max_bid": body.get("max_bid"),
+            "status": self._awarded_code,
+            "creation_date": datetime.utcnow().isoformat(),
+        }
+        instance["status"] = self._resolved_code
+        self.awarded_at[instance_id] = time.perf_counter()
+        return 200, self.proposals[instance_id]
+
+    def _send_message(self, instance_id: str, body: dict) -> tuple[int, object]:
+        if instance_id not in self.chats:
+            return 404, {"detail": "Not found"}
+        self.chats[instance_id].append(
+            {
+                "sender": "provider",
+                "message": body.get("message", ""),
+                "timestamp": datetime.utcnow().isoformat(),
+            }
+        )
+        self.reported_at.setdefault(instance_id, time.perf_counter())
+        return 200, {"status": "sent"}
+
+    def handle_request(self, request: httpx.Request) -> httpx.Response:
+        body = json.loads(request.content) if request.content else None
+        status, payload = self.handle(
+            request.method, request.url.path, dict(request.url.params), body
+        )
+        return httpx.Response(status, json=payload)
+
+    def transport(self) -> httpx.MockTransport:
+        return httpx.MockTransport(self.handle_request)
+
+    def pipeline_latencies(self) -> list[float]:
+        """Seconds from award to the solution being reported, per reported instance."""
+        with self._lock:
+            return [
+                self.reported_at[instance_id] - self.awarded_at[instance_id]
+                for instance_id in self.reported_at
+                if instance_id in self.awarded_at
+            ]
+
+    def proposal_count(self) -> int:
+        with self._lock:
+            return len(self.proposals)
+
+    def reported_count(self) -> int:
+        with self._lock:
+            return len(self.reported_at)
+
+
+class FakeGitHub:
+    """GitHub stand-in backed by bare repositories under ``root``.
+
+    ``git_config_env`` rewrites github.com URLs, with or without the token, to the bare
+    repositories, so cloning, fetching and pushing run real git against local remotes.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        self._lock = threading.Lock()
+        self.pull_requests: list[dict] = []
+        self.pr_comments: dict[str, list[str]] = {}
+
+    def git_config_env(self) -> dict[str, str]:
+        base = f"file://{self.root}/"
+        prefixes = ["https://github.com/", f"https://{BENCH_TOKEN}@github.com/"]
+        config = [(f"url.{base}.insteadOf", prefix) for prefix in prefixes]
+        # Let the local upload-pack serve the partial clones of the clone strategies.
+        config.append(("uploadpack.allowFilter", "true"))
+        env = {"GIT_CONFIG_COUNT": str(len(config))}
+        for index, (key, value) in enumerate(config):
+            env[f"GIT_CONFIG_KEY_{index}"] = key
+            env[f"GIT_CONFIG_VALUE_{index}"] = value
+        return env
+
+    def _bare_path(self, owner: str, name: str) -> Path:
+        return self.root / owner / f"{name.removesuffix('.git')}.git"
+
+    def create_upstream(self, name: str, files: dict[str, str]) -> None:
+        bare_path = self._bare_path(UPSTREAM_OWNER, name)
+        git.Repo.init(bare_path, bare=True, initial_branch="main")
+        with tempfile.TemporaryDirectory() as work_dir:
+            repo = git.Repo.init(work_dir, initial_branch="main")
+            for path, content in files.items():
+                (Path(work_dir) / path).write_text(content)
+            repo.index.add(list(files))
+            repo.index.commit("Initial commit")
+            repo.create_remote("origin", str(bare_path)).push("main:main")
+
+    def fork_repo(self, github_url: str, github_token: str) -> str:
+        name = github_url.rstrip("/").removesuffix(".git").rsplit("/", 1)[-1]
+        with self._lock:
+            fork_path = self._bare_path(FORK_OWNER, name)
+            if not fork_path.exists():
+                subprocess.run(
+                    [
+                        "git",
+                        "clone",
+                        "--bare",
+                        "--quiet",
+                        str(self._bare_path(UPSTREAM_OWNER, name)),
+                        str(fork_path),
+                    ],
+                    check=True,
+                )
+        return f"https://github.com/{FORK_OWNER}/{name}.git"
+
+    def create_and_push_branch(self, repo_path, branch_name: str, github_token: str) -> None:
+        repo = git.Repo(repo_path)
+        repo.remotes.origin.fetch()
+        if f"origin/{branch_name}" in repo.refs:
+            repo.git.checkout(f"origin/{branch_name}", b=branch_name)
+        else:
+            repo.create_head(branch_name).checkout()
+            repo.remotes.origin.push(refspec=f"{branch_name}:{branch_name}", set_upstream=True)
+
+    def create_pull_request(
+        self,
+        source_repo_name: str,
+        target_repo_name: str,
+        source_repo_path: str,
+        github_token: str,
+        pr_title: str = None,
+        pr_body: str = None,
+        base_branch: str = "main",
+    ) -> str:
+        with self._lock:
+            number = len(self.pull_requests) + 1
+            self.pull_requests.append(
+                {"source": source_repo_name, "target": target_repo_name, "title": pr_title}
+            )
+        return f"https://github.com/{target_repo_name.removesuffix('.git')}/pull/{number}"
+
+    def add_logs_as_pr_comments(self, pr_url: str, github_token: str, logs: str) -> None:
+        with self._lock:
+            self.pr_comments.setdefault(pr_url, []).append(logs)
+
+    def get_last_pr_comments(self, pr_url: str, github_token: str) -> str | bool:
+        return False
+
+
+def launch_noop_agent(agent_seconds: float):
+    """Return a container launcher that commits a file in place of running an agent."""
+
+    def launch(timeout: int = 3600, instance_id=None, warm_container=None, **kwargs):
+        repo_directory = next(
+            host for host, bind in kwargs["volumes"].items() if bind["bind"] == "/app"
+        )
+        time.sleep(agent_seconds)
+        (Path(repo_directory) / f"greeting_{instance_id}.txt").write_text("Hello from bench\n")
+        raw_logs = "Applied edit to greeting file"
+        return "Added a greeting file.", raw_logs, len(raw_logs)
+
+    return launch
+
+
+def fake_completion(model: str, messages: list[dict], create=None, bypass: bool = False) -> str:
+    return "Bench generated text"
+
+
+def model_prices() -> list[dict]:
+    return [
+        {"id": "openai/gpt-4o", "pricing": {"prompt": "0.0000025", "completion": "0.00001"}},
+        {
+            "id": "anthropic/claude-3.5-sonnet",
+            "pricing": {"prompt": "0.000003", "completion": "0.000015"},
+        },
+    ]
@@ -0,0 +1,202 @@
+"""Runs the market scan and solve handlers against the stand-ins in ``bench.fakes``.
+
+Import this module only after ``bench.__main__`` has prepared the environment, since the
+settings and the solve worker pool are created on import.
+"""
+
+import asyncio
+import os
+import resource
+import time
+import tracemalloc
+from contextlib import ExitStack
+from pathlib import Path
+from typing import Callable, Optional
+from unittest import mock
+
+from loguru import logger
+
+from src import market_scan, solve_instances, utils
+from src.config import SETTINGS
+from src.utils import agent_market, market_api, pricing
+from src.utils import git as git_utils
+
+from .fakes import (
+    FakeGitHub,
+    FakeMarket,
+    fake_completion,
+    launch_noop_agent,
+    model_prices,
+)
+from .market_simulator import MarketSimulator
+from .metrics import StageMetrics
+
+_UPSTREAM_FILES = {
+    "README.md": "# Bench repository\n\nRun the tests with `pytest`.\n",
+    "pyproject.toml": '[tool.pytest.ini_options]\ntestpaths = ["tests"]\n',
+    "greeting.py": "def greet():\n    return 'hello'\n",
+}
+
+
+def _install_fakes(
+    stack: ExitStack,
+    market: FakeMarket,
+    github: FakeGitHub,
+    metrics: StageMetrics,
+    agent_seconds: float,
+    simulator: Optional[MarketSimulator],
+) -> None:
+    if simulator is None:
+        client_kwargs = market_api._client_kwargs
+
+        def bench_client_kwargs() -> dict:
+            return {**client_kwargs(), "transport": market.transport()}
+
+        stack.enter_context(mock.patch.object(market_api, "_client_kwargs", bench_client_kwargs))
+    else:
+        stack.enter_context(mock.patch.object(SETTINGS, "market_url", simulator.url))
+    stack.enter_context(mock.patch.object(pricing, "fetch_model_prices", lambda _: model_prices()))
+    stack.enter_context(mock.patch.object(agent_market, "cached_completion", fake_completion))
+    stack.enter_context(
+        mock.patch.object(git_utils, "generate_commit_message", lambda _: "Bench commit")
+    )
+
+    github_stages = {
+        "fork": ("fork_repo", github.fork_repo),
+        "branch": ("create_and_push_branch", github.create_and_push_branch),
+        "pull_request": ("create_pull_request", github.create_pull_request),
+        "pr_comment": ("add_logs_as_pr_comments", github.add_logs_as_pr_comments),
+        "pr_comments": ("get_last_pr_comments", github.get_last_pr_comments),
+        "clone": ("clone_repository", utils.clone_repository),
+        "commit": ("add_and_commit", utils.add_and_commit),
+        "push": ("push_commits", utils.push_commits),
+    }
+    for stage, (name, fn) in github_stages.items():
+        stack.enter_context(mock.patch.object(utils, name, metrics.timed(stage, fn)))
+
+    stage_functions = [
+        (market_scan, "_create_proposal_for_instance", "propose"),
+        (solve_instances, "_get_instance_to_solve", "prefetch"),
+        (solve_instances, "_solve_instance", "solve"),
+    ]
+    for module, name, stage in stage_functions:
+        fn = getattr(module, name)
+        stack.enter_context(mock.patch.object(module, name, metrics.timed(stage, fn)))
+    stack.enter_context(
+        mock.patch.object(
+            solve_instances,
+            "launch_container_with_repo_mounted",
+            metrics.timed("agent", launch_noop_agent(agent_seconds)),
+        )
+    )
+
+
+async def _run_cycles(
+    market: FakeMarket,
+    metrics: StageMetrics,
+    instance_count: int,
+    cycle_interval: float,
+    timeout: float,
+    scan_only: bool,
+) -> int:
+    handlers = [metrics.timed("scan_cycle", market_scan.async_market_scan_handler)]
+    if not scan_only:
+        handlers.append(
+            metrics.timed("solve_cycle", solve_instances.async_solve_instances_handler)
+        )
+    done = market.proposal_count if scan_only else market.reported_count
+    deadline = time.perf_counter() + timeout
+
+    cycles = 0
+    try:
+        while done() < instance_count:
+            if time.perf_counter() > deadline:
+                logger.warning(f"Benchmark timed out after {timeout}s")
+                break
+            for handler in handlers:
+                try:
+                    await handler()
+                except Exception as e:
+                    logger.error(f"Handler {handler.__name__} failed: {type(e).__name__}: {e}")
+            cycles += 1
+            await asyncio.sleep(cycle_interval)
+    finally:
+        await market_api.aclose_async_client()
+    return cycles
+
+
+def run_benchmark(
+    workdir: Path,
+    instance_count: int,
+    repo_count: int,
+    agent_seconds: float,
+    cycle_interval: float,
+    timeout: float,
+    simulator_factory: Optional[Callable[[FakeMarket], MarketSimulator]] = None,
+    scan_only: bool = False,
+) -> dict:
+    """Run the pipeline until every instance is solved and return the measurements.
+
+    The market is served in process through a mock transport, or over localhost by the
+    simulator ``simulator_factory`` builds. With ``scan_only`` the run ends once every
+    instance has a proposal and nothing is solved.
+    """
+    market = FakeMarket(
+        instance_count,
+        repo_count,
+        SETTINGS.market_open_instance_code,
+        SETTINGS.market_resolved_instance_code,
+        SETTINGS.market_awarded_proposal_code,
+    )
+    github = FakeGitHub(workdir / "remotes")
+    os.environ.update(github.git_config_env())
+    for index in range(repo_count):
+        github.create_upstream(f"repo-{index}", _UPSTREAM_FILES)
+
+    simulator = simulator_factory(market) if simulator_factory else None
+
+    metrics = StageMetrics()
+    tracemalloc.start()
+    start = time.perf_counter()
+    with ExitStack() as stack:
+        if simulator is not None:
+            simulator.start()
+            stack.callback(simulator.stop)
+        _install_fakes(stack, market, github, metrics, agent_seconds, simulator)
+        try:
+            cycles = asyncio.run(
+                _run_cycles(
+                    market, metrics, instance_count, cycle_interval, timeout, scan_only
+                )
+            )
+        finally:
+            solve_instances.shutdown_solve_workers(wait=True)
+            market_api.close_client()
+    wall_seconds = time.perf_counter() - start
+    _, peak_heap = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    for latency in market.pipeline_latencies():
+        metrics.record("end_to_end", latency)
+
+    solved = market.proposal_count() if scan_only else market.reported_count()
+    report = {
+        "instances": instance_count,
+        "scan_only": scan_only,
+        "solved": solved,
+        "cycles": cycles,
+        "wall_seconds": wall_seconds,
+        "cycles_per_second": cycles / wall_seconds,
+        "instances_per_second": solved / wall_seconds,
+        "peak_heap_bytes": peak_heap,
+        "peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+        "stages": metrics.summary(),
+        "settings": {
+            "max_concurrent_solves": SETTINGS.max_concurrent_solves,
+            "prefetch_concurrency": SETTINGS.prefetch_concurrency,
+            "git_mirror_cache_enabled": SETTINGS.git_mirror_cache_enabled,
+        },
+    }
+    if simulator is not None:
+        report["market_requests"] = simulator.request_counts()
+    return report
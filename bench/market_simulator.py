@@ -0,0 +1,212 @@
+"""Serve a simulated Agent Market API on localhost for load testing.
+
+Usage: python -m bench.market_simulator --instances 10000 --latency-ms 20 --throttle-rate 0.02
+
+Point MARKET_URL at the printed address to run the scanner or the solver against it. Request
+counts per endpoint and status code are printed on exit.
+"""
+
+import argparse
+import json
+import random
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+from urllib.parse import parse_qsl, urlsplit
+
+from .fakes import FakeMarket, route_template
+
+# The defaults of the market_*_code settings.
+_OPEN_CODE = 0
+_RESOLVED_CODE = 3
+_AWARDED_CODE = 1
+
+
+class MarketSimulator:
+    """Localhost HTTP server in front of a ``FakeMarket`` that injects latency and errors.
+
+    Every request is delayed by ``latency`` seconds plus up to ``jitter`` seconds, then
+    rejected with a 429 with probability ``throttle_rate`` or a 503 with probability
+    ``error_rate`` before it reaches the market, so rejected requests never change its state.
+    """
+
+    def __init__(
+        self,
+        market: FakeMarket,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        error_rate: float = 0.0,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.market = market
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.error_rate = error_rate
+        self.retry_after = retry_after
+        self._random = random.Random(seed)
+        self._random_lock = threading.Lock()
+        self._counts: Counter[tuple[str, str, int]] = Counter()
+        self._counts_lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler_class())
+        self._server.daemon_threads = True
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}"
+
+    def _handler_class(self) -> type[BaseHTTPRequestHandler]:
+        simulator = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+            disable_nagle_algorithm = True
+
+            def do_GET(self):
+                simulator._serve(self)
+
+            def do_POST(self):
+                simulator._serve(self)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def _fault(self) -> Optional[int]:
+        with self._random_lock:
+            delay = self.latency + self._random.uniform(0, self.jitter)
+            roll = self._random.random()
+        if delay:
+            time.sleep(delay)
+        if roll < self.throttle_rate:
+            return 429
+        if roll < self.throttle_rate + self.error_rate:
+            return 503
+        return None
+
+    def _serve(self, request: BaseHTTPRequestHandler) -> None:
+        url = urlsplit(request.path)
+        length = int(request.headers.get("Content-Length") or 0)
+        raw_body = request.rfile.read(length) if length else b""
+
+        headers = {}
+        status = self._fault()
+        if status == 429:
+            payload = {"detail": "Too many requests"}
+            headers["Retry-After"] = str(self.retry_after)
+        elif status is not None:
+            payload = {"detail": "Service unavailable"}
+        else:
+            try:
+                body = json.loads(raw_body) if raw_body else None
+            except ValueError:
+                status, payload = 422, {"detail": "Invalid JSON body"}
+            else:
+                status, payload = self.market.handle(
+                    request.command, url.path, dict(parse_qsl(url.query)), body
+                )
+
+        with self._counts_lock:
+            self._counts[(request.command, route_template(url.path), status)] += 1
+
+        data = json.dumps(payload).encode()
+        request.send_response(status)
+        request.send_header("Content-Type", "application/json")
+        request.send_header("Content-Length", str(len(data)))
+        for name, value in headers.items():
+            request.send_header(name, value)
+        request.end_headers()
+        request.wfile.write(data)
+
+    def request_counts(self) -> dict[str, dict[str, int]]:
+        """Requests served so far, keyed by ``METHOD route`` and then by status code."""
+        counts: dict[str, dict[str, int]] = {}
+        with self._counts_lock:
+            for (method, route, status), count in sorted(self._counts.items()):
+                counts.setdefault(f"{method} {route}", {})[str(status)] = count
+        return counts
+
+    def start(self) -> None:
+        self._thread = threading.Thread(
+            target=self._server.serve_forever, name="market-simulator", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self) -> None:
+        self._server.shutdown()
+        self._server.server_close()
+        if self._thread is not None:
+            self._thread.join()
+
+
+def add_fault_arguments(parser: argparse.ArgumentParser) -> None:
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="Delay added per request.")
+    parser.add_argument(
+        "--jitter-ms", type=float, default=0.0, help="Random extra delay, up to this much."
+    )
+    parser.add_argument(
+        "--throttle-rate", type=float, default=0.0, help="Fraction of requests answered with 429."
+    )
+    parser.add_argument(
+        "--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503."
+    )
+    parser.add_argument("--seed", type=int, default=None, help="Seed for fault injection.")
+
+
+def simulator_from_args(market: FakeMarket, args: argparse.Namespace, port: int = 0):
+    return MarketSimulator(
+        market,
+        port=port,
+        latency=args.latency_ms / 1000,
+        jitter=args.jitter_ms / 1000,
+        throttle_rate=args.throttle_rate,
+        error_rate=args.error_rate,
+        seed=args.seed,
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.market_simulator", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--port", type=int, default=8765, help="Port to listen on.")
+    parser.add_argument("--instances", type=int, default=10000, help="Open instances to seed.")
+    parser.add_argument("--repos", type=int, default=100, help="Distinct repositories referenced.")
+    parser.add_argument(
+        "--proposals", type=int, default=0, help="Instances seeded with an awarded proposal."
+    )
+    parser.add_argument(
+        "--chat-messages", type=int, default=0, help="Requester messages seeded per instance."
+    )
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+
+    market = FakeMarket(args.instances, args.repos, _OPEN_CODE, _RESOLVED_CODE, _AWARDED_CODE)
+    market.seed_proposals(args.proposals)
+    market.seed_chats(args.chat_messages)
+
+    simulator = simulator_from_args(market, args, port=args.port)
+    simulator.start()
+    print(f"Market simulator listening on {simulator.url} with {args.instances} instances")
+    print(f"Run the services with MARKET_URL={simulator.url}")
+    try:
+        while True:
+            time.sleep(3600)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        simulator.stop()
+        print(json.dumps(simulator.request_counts(), indent=2))
+
+
+if __name__ == "__main__":
+    main()
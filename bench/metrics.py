@@ -0,0 +1,107 @@
+import asyncio
+import functools
+import math
+import threading
+import time
+from collections import defaultdict
+from typing import Callable
+
+PERCENTILES = (50, 90, 99)
+
+
+def percentile(samples: list[float], p: float) -> float:
+    """Nearest-rank percentile of ``samples``."""
+    ordered = sorted(samples)
+    return ordered[max(math.ceil(p / 100 * len(ordered)) - 1, 0)]
+
+
+class StageMetrics:
+    """Latency samples per pipeline stage, recorded from any thread."""
+
+    def __init__(self):
+        self._samples: dict[str, list[float]] = defaultdict(list)
+        self._errors: dict[str, int] = defaultdict(int)
+        self._lock = threading.Lock()
+
+    def record(self, stage: str, seconds: float, failed: bool = False) -> None:
+        with self._lock:
+            self._samples[stage].append(seconds)
+            if failed:
+                self._errors[stage] += 1
+
+    def timed(self, stage: str, fn: Callable) -> Callable:
+        """Wrap a sync or async function so that every call is recorded under ``stage``."""
+        if asyncio.iscoroutinefunction(fn):
+
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                start = time.perf_counter()
+                failed = True
+                try:
+                    result = await fn(*args, **kwargs)
+                    failed = False
+                    return result
+                finally:
+                    self.record(stage, time.perf_counter() - start, failed)
+
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            start = time.perf_counter()
+            failed = True
+            try:
+                result = fn(*args, **kwargs)
+                failed = False
+                return result
+            finally:
+                self.record(stage, time.perf_counter() - start, failed)
+
+        return wrapper
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        with self._lock:
+            samples = {stage: list(values) for stage, values in self._samples.items()}
+            errors = dict(self._errors)
+
+        summary = {}
+        for stage, values in samples.items():
+            summary[stage] = {
+                "count": len(values),
+                "errors": errors.get(stage, 0),
+                **{f"p{p}": percentile(values, p) for p in PERCENTILES},
+                "max": max(values),
+            }
+        return summary
+
+
+def format_report(report: dict) -> str:
+    header = f"{'stage':<16}{'count':>7}{'errors':>8}" + "".join(
+        f"{f'p{p} (ms)':>12}" for p in PERCENTILES
+    )
+    lines = [header + f"{'max (ms)':>12}", "-" * (len(header) + 12)]
+    for stage, stats in report["stages"].items():
+        lines.append(
+            f"{stage:<16}{stats['count']:>7}{stats['errors']:>8}"
+            + "".join(f"{stats[f'p{p}'] * 1000:>12.1f}" for p in PERCENTILES)
+            + f"{stats['max'] * 1000:>12.1f}"
+        )
+
+    outcome = "instances proposed" if report["scan_only"] else "instances solved"
+    lines += [
+        "",
+        f"{outcome + ':':<21}{report['solved']}/{report['instances']}",
+        f"cycles:              {report['cycles']}",
+        f"wall time:           {report['wall_seconds']:.2f}s",
+        f"cycles/sec:          {report['cycles_per_second']:.2f}",
+        f"instances/sec:       {report['instances_per_second']:.2f}",
+        f"peak python heap:    {report['peak_heap_bytes'] / 1024**2:.1f} MiB",
+        f"peak RSS:            {report['peak_rss_bytes'] / 1024**2:.1f} MiB",
+    ]
+
+    if "market_requests" in report:
+        lines += ["", "market requests:"]
+        for route, statuses in report["market_requests"].items():
+            counts = ", ".join(f"{status}: {count}" for status, count in statuses.items())
+            lines.append(f"  {route:<48}{counts}")
+    return "\n".join(lines)
@@ -0,0 +1,129 @@
+"""Time the ways of giving a cloned workspace to the user the agent containers run as.
+
+Usage: python -m bench.ownership --files 100000 --dirs 2000
+
+A synthetic git repository is handed to the current user with ``chown -R`` and with the
+ownership normalizer, once while everything is already owned by that user, as after a clone,
+and, when run as root, once with a fraction of the entries owned by another user. The first
+``git status`` afterwards is timed as well: ``chown -R`` changes the ctime of every file, so
+git has to check each one again. ``OWNERSHIP_MODE=skip`` does no work at all and is not timed.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from loguru import logger
+
+from .fakes import PLACEHOLDER_SETTINGS
+
+_FOREIGN_UID = 65534
+
+
+def _parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(
+        prog="python -m bench.ownership", description=__doc__.split("\n")[0]
+    )
+    parser.add_argument("--files", type=int, default=100000, help="Files in the tree.")
+    parser.add_argument("--dirs", type=int, default=2000, help="Directories in the tree.")
+    parser.add_argument("--workers", type=int, default=8, help="OWNERSHIP_WORKERS.")
+    parser.add_argument("--repeat", type=int, default=3, help="Runs per measurement.")
+    parser.add_argument(
+        "--foreign-fraction",
+        type=float,
+        default=0.01,
+        help="Fraction of entries owned by another user in the second scenario (root only).",
+    )
+    return parser.parse_args()
+
+
+def _build_tree(root: Path, file_count: int, dir_count: int) -> list[Path]:
+    dirs = [root]
+    for index in range(dir_count):
+        parent = dirs[index // 10] if index >= 10 else root
+        path = parent / f"dir{index}"
+        path.mkdir()
+        dirs.append(path)
+
+    entries = list(dirs[1:])
+    for index in range(file_count):
+        path = dirs[index % len(dirs)] / f"file{index}.txt"
+        path.write_bytes(b"x")
+        entries.append(path)
+    return entries
+
+
+def _git(root: Path, *args: str) -> None:
+    subprocess.run(["git", *args], cwd=root, check=True, capture_output=True)
+
+
+def _init_repository(root: Path) -> None:
+    _git(root, "init", "-q")
+    _git(root, "add", "-A")
+    _git(root, "-c", "user.name=bench", "-c", "user.email=bench@example.com", "commit", "-qm", "x")
+
+
+def _time(
+    run: Callable[[], object], prepare: Callable[[], None], root: Path, repeat: int
+) -> tuple[float, float]:
+    """Median seconds of ``run`` and of the ``git status`` that follows it."""
+    run_samples, status_samples = [], []
+    for _ in range(repeat):
+        prepare()
+        _git(root, "update-index", "-q", "--refresh")
+        start = time.perf_counter()
+        run()
+        run_samples.append(time.perf_counter() - start)
+
+        start = time.perf_counter()
+        _git(root, "status", "--porcelain")
+        status_samples.append(time.perf_counter() - start)
+    return statistics.median(run_samples), statistics.median(status_samples)
+
+
+def main() -> None:
+    args = _parse_args()
+    logger.remove()
+    logger.add(sys.stderr, level="WARNING")
+    os.environ.update(PLACEHOLDER_SETTINGS)
+
+    from src.utils.file_utils import normalize_ownership
+
+    uid, gid = os.getuid(), os.getgid()
+    with tempfile.TemporaryDirectory(prefix="agent-market-ownership-") as workdir:
+        root = Path(workdir)
+        entries = _build_tree(root, args.files, args.dirs)
+        _init_repository(root)
+        print(f"Repository: {args.files} files in {args.dirs} directories")
+
+        methods = {
+            "chown -R": lambda: subprocess.run(
+                ["chown", "-R", f"{uid}:{gid}", workdir], check=True
+            ),
+            "normalize": lambda: normalize_ownership(root, uid, gid, workers=args.workers),
+        }
+        scenarios = {"already owned": lambda: None}
+        if os.geteuid() == 0 and args.foreign_fraction > 0:
+            foreign = random.Random(0).sample(
+                entries, max(int(len(entries) * args.foreign_fraction), 1)
+            )
+            scenarios[f"{args.foreign_fraction:.0%} foreign"] = lambda: [
+                os.chown(path, _FOREIGN_UID, _FOREIGN_UID) for path in foreign
+            ]
+
+        print(f"{'scenario':<16}{'method':<12}{'ownership (s)':>15}{'git status (s)':>16}")
+        for scenario, prepare in scenarios.items():
+            for method, run in methods.items():
+                seconds, status_seconds = _time(run, prepare, root, args.repeat)
+                print(f"{scenario:<16}{method:<12}{seconds:>15.3f}{status_seconds:>16.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -9,8 +9,13 @@ from pathlib import Path
 from dotenv import load_dotenv
 
 from src.config import SETTINGS
-from src.market_scan import async_market_scan_handler
-from src.solve_instances import solve_instances_handler
+from src.containers import start_orphan_sweeper
+from src.market_scan import market_scan_handler
+from src.solve_instances import (
+    prepare_agent_runtime,
+    shutdown_solve_workers,
+    solve_instances_handler,
+)
 from src.utils.git import accept_repo_invitations
 
 
@@ -35,10 +40,7 @@ def market_scan_process():
     """Process for handling market scanning."""
     while True:
         try:
-            # Create event loop for this process
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            loop.run_until_complete(async_market_scan_handler())
+            market_scan_handler()
         except Exception as e:
             print(f"Error in market scan process: {e}")
         time.sleep(10)
@@ -59,12 +61,17 @@ def git_process():
 
 def solve_instances_process():
     """Process for handling instance solving."""
-    while True:
-        try:
-            solve_instances_handler()
-        except Exception as e:
-            print(f"Error in solve instances process: {e}")
-        time.sleep(10)
+    start_orphan_sweeper()
+    prepare_agent_runtime()
+    try:
+        while True:
+            try:
+                solve_instances_handler()
+            except Exception as e:
+                print(f"Error in solve instances process: {e}")
+            time.sleep(10)
+    except KeyboardInterrupt:
+        shutdown_solve_workers()
 
 
 def main():
@@ -1,9 +1,19 @@
+from src.enums import AgentType
+
+from . import aider, open_hands, raaid
 from .aider import get_container_kwargs as aider_get_container_kwargs
 from .aider import suggest_test_command as aider_suggest_test_command
 from .open_hands import get_container_kwargs as open_hands_get_container_kwargs
 from .raaid import get_container_kwargs as raaid_get_container_kwargs
 
+AGENT_IMAGES: dict[AgentType, dict[str, str]] = {
+    AgentType.aider: aider.IMAGES,
+    AgentType.open_hands: open_hands.IMAGES,
+    AgentType.raaid: raaid.IMAGES,
+}
+
 __all__ = [
+    "AGENT_IMAGES",
     "aider_get_container_kwargs",
     "aider_suggest_test_command",
     "open_hands_get_container_kwargs",
@@ -1,25 +1,69 @@
 import base64
+import hashlib
+import json
 import os
+import re
 import shlex
+import threading
+import tomllib
 
 import openai
 from dotenv import load_dotenv
 from loguru import logger
 
 from src.config import SETTINGS
+from src.utils.llm_cache import cached_completion
+
+from .images import pinned_image
 
 load_dotenv()
 openai.api_key = SETTINGS.openai_api_key
 WEAK_MODEL = "gpt-4o-mini"
 
+_DOCKER_IMAGE = "paulgauthier/aider"
+IMAGES = {_DOCKER_IMAGE: pinned_image(_DOCKER_IMAGE)}
+
+
+_README_FILES = ("README.md", "README.txt", "README.rst", "README")
+_SKIPPED_DIRS = {"node_modules", "vendor", "third_party", "site-packages", "build", "dist"}
+_MANIFEST_FILES = (
+    "Makefile",
+    "pyproject.toml",
+    "setup.cfg",
+    "pytest.ini",
+    "tox.ini",
+    "package.json",
+    "Cargo.toml",
+    "go.mod",
+)
+_NODE_LOCKFILES = {"pnpm-lock.yaml": "pnpm test", "yarn.lock": "yarn test"}
+_MAKE_TEST_TARGETS = ("test", "tests", "check")
+_NPM_DEFAULT_TEST = "no test specified"
+
+_test_command_cache: dict[str, str] = {}
+_test_command_cache_lock = threading.Lock()
+
+
+def _read_root_file(repo_path: str, name: str) -> str | None:
+    try:
+        with open(os.path.join(repo_path, name), "r", encoding="utf-8") as f:
+            return f.read()
+    except (OSError, UnicodeDecodeError):
+        return None
+
 
 def _get_readme_content(repo_path: str) -> str:
     logger.info(f"Searching for README files in the repository: {repo_path}")
-    readme_files = ["README.md", "README.txt", "README.rst", "README"]
+    for file in _README_FILES:
+        content = _read_root_file(repo_path, file)
+        if content is not None:
+            logger.info(f"README file found at the repository root: {file}")
+            return content
 
-    for root, _, files in os.walk(repo_path):
+    for root, dirs, files in os.walk(repo_path):
+        dirs[:] = [d for d in dirs if d not in _SKIPPED_DIRS and not d.startswith(".")]
         for file in files:
-            if file in readme_files:
+            if file in _README_FILES:
                 readme_path = os.path.join(root, file)
                 logger.info(f"README file found: {readme_path}")
                 try:
@@ -34,17 +78,94 @@ def _get_readme_content(repo_path: str) -> str:
     return ""
 
 
-def suggest_test_command(repo_path: str) -> str:
-    logger.info(f"Starting test command suggestion process for repo: {repo_path}")
+def _make_test_command(makefile: str) -> str | None:
+    for target in _MAKE_TEST_TARGETS:
+        if re.search(rf"^{target}\s*:(?!=)", makefile, re.MULTILINE):
+            return f"make {target}"
+    return None
+
+
+def _python_test_command(manifests: dict[str, str]) -> str | None:
+    if "pytest.ini" in manifests:
+        return "pytest"
+    if "[tool:pytest]" in manifests.get("setup.cfg", ""):
+        return "pytest"
+    if "[pytest]" in manifests.get("tox.ini", ""):
+        return "pytest"
+
+    pyproject = manifests.get("pyproject.toml")
+    if pyproject is not None:
+        try:
+            tool = tomllib.loads(pyproject).get("tool", {})
+        except tomllib.TOMLDecodeError:
+            tool = {}
+        if "pytest" in tool or re.search(r"""["'\s]pytest\b""", pyproject):
+            return "pytest"
+
+    if "tox.ini" in manifests:
+        return "tox"
+    return None
+
+
+def _node_test_command(repo_path: str, package_json: str) -> str | None:
+    try:
+        scripts = json.loads(package_json).get("scripts") or {}
+    except (ValueError, AttributeError):
+        return None
+    test_script = scripts.get("test")
+    if not isinstance(test_script, str) or _NPM_DEFAULT_TEST in test_script:
+        return None
+    for lockfile, command in _NODE_LOCKFILES.items():
+        if os.path.exists(os.path.join(repo_path, lockfile)):
+            return command
+    return "npm test"
+
+
+def _detect_test_commands(repo_path: str, manifests: dict[str, str]) -> list[str]:
+    """Derive candidate test commands from the manifests at the repository root.
+
+    A test target in the Makefile is the project's own entry point, so it wins outright.
+    Otherwise every ecosystem found contributes its conventional command.
+    """
+    if "Makefile" in manifests:
+        command = _make_test_command(manifests["Makefile"])
+        if command:
+            return [command]
+
+    candidates = [
+        _python_test_command(manifests),
+        _node_test_command(repo_path, manifests["package.json"])
+        if "package.json" in manifests
+        else None,
+        "cargo test" if "Cargo.toml" in manifests else None,
+        "go test ./..." if "go.mod" in manifests else None,
+    ]
+    return [command for command in candidates if command]
+
+
+def _manifests_digest(repo_path: str, manifests: dict[str, str]) -> str:
+    digest = hashlib.sha256()
+    for name in sorted(manifests):
+        digest.update(f"{name}\0{manifests[name]}\0".encode())
+    for lockfile in _NODE_LOCKFILES:
+        if os.path.exists(os.path.join(repo_path, lockfile)):
+            digest.update(f"{lockfile}\0".encode())
+    return digest.hexdigest()
+
+
+def _suggest_test_command_with_llm(repo_path: str, candidates: list[str]) -> str:
     readme_content = _get_readme_content(repo_path)
 
     if not readme_content:
         logger.warning("No README content available to analyze for test commands.")
-        return ""
+        return candidates[0] if candidates else ""
 
+    candidates_hint = (
+        f" The project manifests suggest one of: {', '.join(candidates)}. " if candidates else ""
+    )
     logger.info("Requesting OpenAI to generate a test command based on README content.")
     try:
-        response = openai.chat.completions.create(
+        command = cached_completion(
             model=WEAK_MODEL,
             messages=[
                 {
@@ -61,6 +182,7 @@ def suggest_test_command(repo_path: str) -> str:
                         "Based on the following README content, "
                         "provide a single shell command necessary to run the project tests. "
                         "Make sure to output a single command. Example: `make tests`."
+                        f"{candidates_hint}"
                         "If the content doesn't specify how to run tests, do not output anything:"
                         "\n\n"
                         f"{readme_content}"
@@ -68,16 +190,51 @@ def suggest_test_command(repo_path: str) -> str:
                 },
             ],
         )
-        command = response.choices[0].message.content.strip()
         if command:
             logger.info(f"Test command successfully generated: {command}")
             return command
         else:
             logger.warning("No suitable test command found in the OpenAI response.")
-            return ""
+            return candidates[0] if candidates else ""
     except Exception as e:
         logger.error(f"Error during OpenAI API call: {e}")
-        return ""
+        return candidates[0] if candidates else ""
+
+
+def suggest_test_command(repo_path: str) -> str:
+    """Suggest the command that runs the tests of the repository at ``repo_path``.
+
+    The command is derived from the manifests at the repository root. The README is only sent
+    to the weak model when the manifests yield no command or several competing ones. Results
+    are cached by the content of the manifests.
+    """
+    logger.info(f"Starting test command suggestion process for repo: {repo_path}")
+    manifests = {}
+    for name in _MANIFEST_FILES:
+        content = _read_root_file(repo_path, name)
+        if content is not None:
+            manifests[name] = content
+
+    cache_key = _manifests_digest(repo_path, manifests) if manifests else None
+    if cache_key:
+        with _test_command_cache_lock:
+            cached = _test_command_cache.get(cache_key)
+        if cached is not None:
+            logger.info(f"Using cached test command: {cached!r}")
+            return cached
+
+    candidates = _detect_test_commands(repo_path, manifests)
+    if len(candidates) == 1:
+        command = candidates[0]
+        logger.info(f"Test command detected from manifests: {command}")
+    else:
+        logger.info(f"Test command is ambiguous from manifests (candidates: {candidates})")
+        command = _suggest_test_command_with_llm(repo_path, candidates)
+
+    if cache_key and command:
+        with _test_command_cache_lock:
+            _test_command_cache[cache_key] = command
+    return command
 
 
 def get_container_kwargs(
@@ -109,7 +266,7 @@ def get_container_kwargs(
     }
     user = f"{os.getuid()}:{os.getgid()}"
     kwargs = {
-        "image": "paulgauthier/aider",
+        "image": IMAGES[_DOCKER_IMAGE],
         "entrypoint": entrypoint,
         "environment": env_vars,
         "user": user,
@@ -0,0 +1,13 @@
+from src.config import SETTINGS
+
+
+def pinned_image(image: str) -> str:
+    """Return the reference to run ``image`` from, pinned to its configured digest if any."""
+    digest = SETTINGS.agent_image_digests.get(image)
+    if not digest:
+        return image
+
+    repository, _, tag = image.rpartition(":")
+    if not repository or "/" in tag:
+        repository = image
+    return f"{repository}@{digest}"
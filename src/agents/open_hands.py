@@ -1,11 +1,15 @@
 import os
+import uuid
 from datetime import datetime
 
 from dotenv import load_dotenv
 
 from src.config import SETTINGS
+from src.containers import SESSION_LABEL, agent_session
 from src.enums import ModelName, ProviderType
 
+from .images import pinned_image
+
 load_dotenv()
 
 
@@ -20,6 +24,8 @@ _MODEL_ALIAS_TO_MODEL: dict[ModelName, dict[ProviderType, str]] = {
 
 _DOCKER_IMAGE = "docker.all-hands.dev/all-hands-ai/openhands:0.28"
 _RUNTIME_IMAGE = "docker.all-hands.dev/all-hands-ai/runtime:0.28-nikolaik"
+# OpenHands resolves the runtime image by tag, so it is pulled by tag and only verified.
+IMAGES = {_DOCKER_IMAGE: pinned_image(_DOCKER_IMAGE), _RUNTIME_IMAGE: _RUNTIME_IMAGE}
 _DOCKER_NETWORK_HOST = ["host.docker.internal:host-gateway"]
 _PROVIDER_CONFIGS: dict[ProviderType, dict[str, str]] = {
     ProviderType.LITELLM: {
@@ -43,7 +49,8 @@ def get_container_kwargs(
         "NEVER PUSH THE CHANGES. "
         "ALWAYS STAY IN THE SAME REPOSITORY BRANCH."
     )
-    entrypoint = ["python", "-m", "openhands.core.main", "-t", solver_command]
+    session = agent_session(repo_directory)
+    entrypoint = ["python", "-m", "openhands.core.main", "-n", session, "-t", solver_command]
     env_vars = {
         "SANDBOX_RUNTIME_CONTAINER_IMAGE": _RUNTIME_IMAGE,
         "SANDBOX_USER_ID": str(os.getuid()),
@@ -66,13 +73,16 @@ def get_container_kwargs(
         "/var/run/docker.sock": {"bind": "/var/run/docker.sock", "mode": "rw"},
         os.path.expanduser("~/.openhands-state"): {"bind": "/.openhands-state", "mode": "rw"},
     }
-    container_name = f"openhands-app-{datetime.now().strftime('%Y%m%d%H%M%S')}"
+    container_name = (
+        f"openhands-app-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex[:8]}"
+    )
     kwargs = {
-        "image": _DOCKER_IMAGE,
+        "image": IMAGES[_DOCKER_IMAGE],
         "entrypoint": entrypoint,
         "environment": env_vars,
         "volumes": volumes,
         "name": container_name,
+        "labels": {SESSION_LABEL: session},
         "extra_hosts": _DOCKER_NETWORK_HOST,
     }
     return kwargs
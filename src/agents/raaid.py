@@ -3,6 +3,12 @@ from typing import Any, Dict
 
 from src.enums import ModelName
 
+from .images import pinned_image
+
+# Built locally from raaid.Dockerfile.
+_DOCKER_IMAGE = "aider-raaid"
+IMAGES = {_DOCKER_IMAGE: pinned_image(_DOCKER_IMAGE)}
+
 
 def get_container_kwargs(
     repo_directory: str,
@@ -30,7 +36,7 @@ def get_container_kwargs(
     env_vars = {key: os.getenv(key) for key in os.environ.keys()}
     user = f"{os.getuid()}:{os.getgid()}"
     kwargs = {
-        "image": "aider-raaid",
+        "image": IMAGES[_DOCKER_IMAGE],
         "entrypoint": entrypoint,
         "environment": env_vars,
         "volumes": volumes,
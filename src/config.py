@@ -4,7 +4,14 @@ from dotenv import load_dotenv
 from pydantic import Field, model_validator
 from pydantic_settings import BaseSettings
 
-from src.enums import AgentType, ModelName, ProviderType
+from src.enums import (
+    AgentType,
+    CloneStrategy,
+    ModelName,
+    OwnershipMode,
+    ProviderType,
+    SchedulePolicy,
+)
 
 load_dotenv()
 
@@ -28,6 +35,31 @@ class Settings(BaseSettings):
 
     market_url: str = Field("https://api.agent.market", description="The URL for the market.")
     market_api_key: str = Field(..., description="The API key for the market.")
+    market_timeout: float = Field(10.0, gt=0, description="The timeout for market API requests.")
+    market_max_connections: int = Field(
+        20, ge=1, description="The maximum number of pooled connections to the market."
+    )
+    market_keepalive_expiry: float = Field(
+        30.0, ge=0, description="Seconds an idle market connection is kept open."
+    )
+    market_http2: bool = Field(
+        False, description="Whether to use HTTP/2 for the market API (requires the h2 package)."
+    )
+    market_retries: int = Field(
+        3, ge=1, description="Attempts for a market request failing with a transient error."
+    )
+    market_retry_max_wait: float = Field(
+        10.0, gt=0, description="The longest wait between attempts of a market request."
+    )
+    market_proposal_concurrency: int = Field(
+        10, ge=1, description="The maximum number of proposals submitted concurrently."
+    )
+    market_proposal_batch_path: str | None = Field(
+        None, description="The market endpoint accepting many proposals at once, if any."
+    )
+    market_proposal_batch_size: int = Field(
+        50, ge=1, description="The number of proposals sent per batch request."
+    )
 
     market_open_instance_code: int = Field(
         0, description="The code for an open instance in the market."
@@ -48,6 +80,174 @@ class Settings(BaseSettings):
         1.2, gt=1, description="Factor to increase bid by when profitable."
     )
     agent_type: AgentType = Field(..., description="The type of agent to use.")
+    max_concurrent_solves: int = Field(
+        1, ge=1, description="The maximum number of instances solved at the same time."
+    )
+    prefetch_concurrency: int = Field(
+        10, ge=1, description="The maximum number of awarded instances fetched concurrently."
+    )
+    prefetch_timeout: float = Field(
+        60.0, gt=0, description="Seconds allowed to fetch a single awarded instance."
+    )
+    schedule_policy: SchedulePolicy = Field(
+        SchedulePolicy.margin_per_minute, description="How queued instances are prioritised."
+    )
+    schedule_aging_per_hour: float = Field(
+        0.1,
+        ge=0,
+        description=(
+            "Priority added per hour a requester has been waiting, in the units of the policy's "
+            "score: credits per container minute for margin-per-minute, credits for reward."
+        ),
+    )
+    schedule_cold_start_minutes: float = Field(
+        20.0, gt=0, description="Expected container minutes to solve a new instance."
+    )
+    schedule_follow_up_minutes: float = Field(
+        8.0, gt=0, description="Expected container minutes to address a PR comment or message."
+    )
+    schedule_expected_output_tokens: int = Field(
+        20000, ge=0, description="Output tokens assumed when estimating the cost of a solve."
+    )
+    instance_store_db: str = Field(
+        "~/.cache/agent-market/instances.sqlite3",
+        description="The SQLite file recording what is known about each awarded instance.",
+    )
+    instance_refresh_interval: float = Field(
+        600.0, ge=0, description="Seconds a stored instance is reused before it is fetched again."
+    )
+    pr_comments_poll_interval: float = Field(
+        300.0, ge=0, description="Seconds between PR comment checks of an unchanged instance."
+    )
+    pr_context_token_budget: int = Field(
+        12000, gt=0, description="Tokens of PR diff and comments given to the agent."
+    )
+    pr_context_file_token_cap: int = Field(
+        2000, gt=0, description="The most tokens of a single file's patch given to the agent."
+    )
+
+    github_cache_ttl: float = Field(
+        300.0, ge=0, description="Seconds GitHub repository and user metadata is cached for."
+    )
+    github_rate_limit_db: str = Field(
+        "~/.cache/agent-market/github_rate_limit.sqlite3",
+        description="The SQLite file holding the GitHub request budget shared by all processes.",
+    )
+    github_low_priority_reserve: int = Field(
+        500, ge=0, description="GitHub requests kept in reserve from low priority calls."
+    )
+    github_rate_limit_retries: int = Field(
+        3, ge=1, description="Attempts for a GitHub operation rejected by the rate limit."
+    )
+    github_rate_limit_max_sleep: float = Field(
+        60.0, gt=0, description="The longest single wait before the GitHub budget is rechecked."
+    )
+    fork_sync_ttl: float = Field(
+        300.0, ge=0, description="Seconds a fork synced with upstream is not checked again."
+    )
+
+    git_mirror_cache_enabled: bool = Field(
+        True, description="Whether to clone repositories through a local mirror cache."
+    )
+    git_mirror_cache_dir: str = Field(
+        "~/.cache/agent-market/git-mirrors", description="The directory holding git mirrors."
+    )
+    git_mirror_cache_max_bytes: int = Field(
+        20 * 1024**3, gt=0, description="The size above which the coldest mirrors are evicted."
+    )
+    clone_strategy: CloneStrategy = Field(
+        CloneStrategy.auto, description="How repositories are cloned for a solve."
+    )
+    clone_depth: int = Field(1, ge=1, description="Commits of history fetched by shallow clones.")
+    clone_blobless_min_kb: int = Field(
+        200 * 1024, ge=0, description="Repository size from which auto clones are blobless."
+    )
+    clone_treeless_min_kb: int = Field(
+        2 * 1024**2, ge=0, description="Repository size from which auto clones are treeless."
+    )
+    clone_sparse_checkout: bool = Field(
+        False, description="Whether partial clones check out only the paths the task mentions."
+    )
+    commit_ignore_patterns: list[str] = Field(
+        [".aider*", "*aider_modify_repo.py"],
+        description="Glob patterns of agent files that are never committed.",
+    )
+    ownership_mode: OwnershipMode = Field(
+        OwnershipMode.normalize,
+        description="How the workspace is given to the user the agent containers run as.",
+    )
+    ownership_workers: int = Field(
+        8, ge=1, description="Threads walking the workspace when normalizing its ownership."
+    )
+
+    container_log_dir: str = Field(
+        "~/.cache/agent-market/container-logs",
+        description="The directory where compressed agent container logs are written.",
+    )
+    container_log_tail_bytes: int = Field(
+        256 * 1024, gt=0, description="Bytes of container log tail kept in memory for summaries."
+    )
+    container_log_max_bytes: int = Field(
+        512 * 1024**2, gt=0, description="Bytes of container log written to disk per container."
+    )
+    container_log_retention_count: int = Field(
+        200, ge=1, description="Container log files kept; older ones are deleted on each run."
+    )
+
+    container_stop_timeout: int = Field(
+        2, ge=0, description="Seconds an agent container gets to stop before it is killed."
+    )
+    container_sweep_interval: float = Field(
+        300.0, gt=0, description="Seconds between sweeps for orphaned agent containers."
+    )
+
+    pre_pull_images: bool = Field(
+        True, description="Whether to pull the agent images when the solve process starts."
+    )
+    agent_image_digests: dict[str, str] = Field(
+        {}, description="Digests agent images are pinned to, keyed by image name."
+    )
+    warm_pool_size: int = Field(
+        0, ge=0, description="The number of idle agent containers kept ready for solves."
+    )
+    warm_pool_dir: str = Field(
+        "~/.cache/agent-market/warm-workspaces",
+        description="The directory holding the workspaces mounted into warm containers.",
+    )
+
+    llm_cache_enabled: bool = Field(
+        True, description="Whether weak model completions are cached on disk."
+    )
+    llm_cache_requester_replies: bool = Field(
+        True, description="Whether PR titles and descriptions for requesters may come from cache."
+    )
+    llm_cache_dir: str = Field(
+        "~/.cache/agent-market/llm", description="The directory holding cached completions."
+    )
+    llm_cache_max_bytes: int = Field(
+        256 * 1024**2, gt=0, description="The size above which the oldest completions are evicted."
+    )
+
+    log_summary_chunk_tokens: int = Field(
+        8000, gt=0, description="Tokens of agent log summarized per weak model call."
+    )
+    log_summary_token_budget: int = Field(
+        64000, gt=0, description="Tokens of agent log sent to the weak model per summary."
+    )
+    log_summary_concurrency: int = Field(
+        4, ge=1, description="The number of log chunks summarized concurrently."
+    )
+
+    model_prices_snapshot: str = Field(
+        "~/.cache/agent-market/model_prices.json",
+        description="The file the OpenRouter model price table is persisted to.",
+    )
+    model_prices_ttl: float = Field(
+        3600.0, gt=0, description="Seconds between background refreshes of model prices."
+    )
+    model_price_aliases: dict[str, str] = Field(
+        {}, description="Model names mapped to the OpenRouter model ids they are priced as."
+    )
 
     openai_api_base: str | None = Field(None, description="The base URL for the OpenAI API.")
 
@@ -1,21 +1,45 @@
+import gzip
+import hashlib
+import os
 import re
+import socket
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+from typing import Optional
 
 import openai
 from docker import from_env as docker_from_env
+from docker.errors import DockerException
 from loguru import logger
 from requests.exceptions import ReadTimeout
 
 from src.config import SETTINGS
+from src.utils.llm_cache import cached_completion
+from src.utils.tokens import split_by_tokens
 
 openai.api_key = SETTINGS.openai_api_key
 WEAK_MODEL = "gpt-4o-mini"
 
+MANAGED_LABEL = "agent-market.managed"
+INSTANCE_LABEL = "agent-market.instance-id"
+OWNER_LABEL = "agent-market.owner"
+# OpenHands starts its runtime sandbox through the Docker socket, so the sandbox carries none of
+# the labels above. It is named after the session of the agent container that started it.
+SESSION_LABEL = "agent-market.session"
+SANDBOX_NAME_PREFIX = "openhands-runtime-"
+SESSION_PREFIX = "agent-market-"
 
-def _clean_logs(logs: str) -> str:
-    anti_escape_logs = re.compile(r"\x1B[@-_][0-?]*[ -/]*[@-~]")
-    logs = anti_escape_logs.sub("", logs).split("Tokens:")[0]
+_sweeper_started = threading.Event()
+# Image references that do not match their pinned digest; containers are never started from them.
+_refused_images: set[str] = set()
 
-    prompt = """
+
+_LOG_SUMMARY_SYSTEM_PROMPT = "You are a helpful assistant that processes technical logs."
+_LOG_SUMMARY_PROMPT = """
     Below are the raw logs from an AI coding assistant. Please rewrite these logs as a clear, 
     concise message to a user, focusing on the important actions and changes made. Remove any 
     technical artifacts, ANSI escape codes, and redundant information. Format the response 
@@ -24,49 +48,422 @@ def _clean_logs(logs: str) -> str:
     Raw logs:
     {logs}
     """
+_LOG_CHUNK_PROMPT = """
+    Below is part {part} of {parts} of the raw logs from an AI coding assistant. List the 
+    important actions it took, the files it changed, and any errors or test results, as short 
+    plain-text bullet points. Leave out everything else.
+
+    Raw logs:
+    {logs}
+    """
+_EXTRACTIVE_KEYWORDS = re.compile(
+    r"error|fail|exception|traceback|passed|applied edit|commit|modif|creat|delet|^\+\+\+ |^--- ",
+    re.IGNORECASE,
+)
+_EXTRACTIVE_TAIL_LINES = 20
+_EXTRACTIVE_MAX_CHARS = 4000
+_TOKEN_LINE_MARKER = b"Tokens:"
+
+
+def _summarize(prompt: str) -> str:
+    return cached_completion(
+        model=WEAK_MODEL,
+        messages=[
+            {"role": "system", "content": _LOG_SUMMARY_SYSTEM_PROMPT},
+            {"role": "user", "content": prompt},
+        ],
+    )
+
+
+def _extractive_summary(logs: str) -> str:
+    """Summarize logs without a model: keyword lines plus the last lines, deduplicated."""
+    lines = [line.strip() for line in logs.splitlines() if line.strip()]
+    tail_start = max(len(lines) - _EXTRACTIVE_TAIL_LINES, 0)
+    selected: dict[str, None] = {}
+    for index, line in enumerate(lines):
+        if index >= tail_start or _EXTRACTIVE_KEYWORDS.search(line):
+            selected[line] = None
+
+    summary = "\n".join(selected)
+    if len(summary) > _EXTRACTIVE_MAX_CHARS:
+        summary = "...\n" + summary[-_EXTRACTIVE_MAX_CHARS:]
+    return summary
+
+
+def _budget_chunks(logs: str) -> list[str]:
+    """Split logs into chunks that fit the summary token budget.
+
+    When the logs exceed the budget the first chunk is kept for context and the rest of the
+    budget goes to the end of the logs, where the outcome of the run is.
+    """
+    chunks = list(split_by_tokens(logs, SETTINGS.log_summary_chunk_tokens, WEAK_MODEL))
+    max_chunks = max(SETTINGS.log_summary_token_budget // SETTINGS.log_summary_chunk_tokens, 1)
+    if len(chunks) > max_chunks:
+        logger.info(f"Summarizing the first and last {max_chunks - 1} of {len(chunks)} log chunks")
+        chunks = chunks[:1] + (chunks[-(max_chunks - 1) :] if max_chunks > 1 else [])
+    return chunks
+
+
+def _clean_logs(logs: str) -> str:
+    anti_escape_logs = re.compile(r"\x1B[@-_][0-?]*[ -/]*[@-~]")
+    logs = anti_escape_logs.sub("", logs)
 
     try:
-        response = openai.chat.completions.create(
-            model=WEAK_MODEL,
-            messages=[
-                {
-                    "role": "system",
-                    "content": "You are a helpful assistant that processes technical logs.",
-                },
-                {"role": "user", "content": prompt.format(logs=logs)},
-            ],
-        )
-        return response.choices[0].message.content.strip()
+        chunks = _budget_chunks(logs)
+        if len(chunks) <= 1:
+            return _summarize(_LOG_SUMMARY_PROMPT.format(logs=logs))
+
+        prompts = [
+            _LOG_CHUNK_PROMPT.format(part=part, parts=len(chunks), logs=chunk)
+            for part, chunk in enumerate(chunks, start=1)
+        ]
+        with ThreadPoolExecutor(max_workers=SETTINGS.log_summary_concurrency) as executor:
+            summaries = list(executor.map(_summarize, prompts))
+        return _summarize(_LOG_SUMMARY_PROMPT.format(logs="\n\n".join(summaries)))
 
     except Exception as e:
-        logger.error(f"Failed to process logs with GPT-4: {e}")
-        return logs
+        logger.error(f"Failed to summarize logs with {WEAK_MODEL}, using extractive summary: {e}")
+        return _extractive_summary(logs)
+
+
+class _LogCapture:
+    """Streams container output into a gzip file, keeping only its tail in memory.
+
+    Lines with the agent's token usage are left out of the tail and the last one is kept in
+    ``token_line``, so the tail summarized for the user holds only what the agent did.
+    """
+
+    def __init__(self, stream, path: Path, tail_bytes: int, max_bytes: int):
+        self._stream = stream
+        self.path = path
+        self._tail: deque[bytes] = deque()
+        self._tail_size = 0
+        self._tail_bytes = tail_bytes
+        self._max_bytes = max_bytes
+        self._partial_line = b""
+        self.total_bytes = 0
+        self.token_line: Optional[str] = None
+        self._thread = threading.Thread(target=self._run, daemon=True)
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def _keep(self, line: bytes) -> None:
+        if _TOKEN_LINE_MARKER in line:
+            self.token_line = line.decode("utf-8", errors="replace").strip()
+            return
+        self._tail.append(line)
+        self._tail_size += len(line)
+        while self._tail_size - len(self._tail[0]) >= self._tail_bytes:
+            self._tail_size -= len(self._tail.popleft())
+
+    def _run(self) -> None:
+        try:
+            with gzip.open(self.path, "wb") as log_file:
+                for chunk in self._stream:
+                    if self.total_bytes < self._max_bytes:
+                        log_file.write(chunk[: self._max_bytes - self.total_bytes])
+                        if self.total_bytes + len(chunk) >= self._max_bytes:
+                            log_file.write(b"\n[log truncated]\n")
+                    self.total_bytes += len(chunk)
+
+                    *lines, self._partial_line = (self._partial_line + chunk).split(b"\n")
+                    for line in lines:
+                        self._keep(line + b"\n")
+                    if len(self._partial_line) >= self._tail_bytes:
+                        self._keep(self._partial_line)
+                        self._partial_line = b""
+        except Exception as e:
+            logger.error(f"Failed to stream container logs to {self.path}: {e}")
+        finally:
+            if self._partial_line:
+                self._keep(self._partial_line)
+                self._partial_line = b""
+
+    def join(self, timeout: Optional[float] = None) -> None:
+        self._thread.join(timeout)
+
+    def is_alive(self) -> bool:
+        return self._thread.is_alive()
+
+    def tail(self) -> str:
+        return b"".join(self._tail)[-self._tail_bytes :].decode("utf-8", errors="replace")
+
+
+def _owner() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _container_labels(instance_id: Optional[str]) -> dict[str, str]:
+    labels = {MANAGED_LABEL: "true", OWNER_LABEL: _owner()}
+    if instance_id:
+        labels[INSTANCE_LABEL] = str(instance_id)
+    return labels
+
+
+def _remove_container(container) -> None:
+    try:
+        container.stop(timeout=SETTINGS.container_stop_timeout)
+        container.remove(force=True)
+        logger.info(f"Removed container {container.name}")
+    except Exception as e:
+        logger.error(f"Failed to remove container {container.name}: {e}")
+
+
+def _remove_containers(containers: list) -> None:
+    if not containers:
+        return
+    with ThreadPoolExecutor(max_workers=min(len(containers), 8)) as executor:
+        list(executor.map(_remove_container, containers))
+
+
+def _sandboxes(docker_client, session: str) -> list:
+    prefix = f"{SANDBOX_NAME_PREFIX}{session}-"
+    containers = docker_client.containers.list(all=True, filters={"name": prefix})
+    return [container for container in containers if container.name.startswith(prefix)]
+
+
+def _session_sandboxes(containers: list) -> list:
+    sandboxes = []
+    for container in containers:
+        session = container.labels.get(SESSION_LABEL)
+        if not session:
+            continue
+        try:
+            sandboxes.extend(_sandboxes(container.client, session))
+        except Exception as e:
+            logger.error(f"Failed to list the sandboxes of container {container.name}: {e}")
+    return sandboxes
+
+
+def reap_containers(containers: list) -> None:
+    """Stop and remove ``containers`` and the sandboxes they started, with a grace period.
+
+    Agent containers are stopped first so that they cannot start another sandbox.
+    """
+    _remove_containers(containers)
+    _remove_containers(_session_sandboxes(containers))
+
+
+def _is_orphan(container) -> bool:
+    host, _, pid = container.labels.get(OWNER_LABEL, "").rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return False
+    if int(pid) == os.getpid():
+        return False
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return True
+    except PermissionError:
+        return False
+    return False
+
+
+def sweep_orphan_containers() -> None:
+    """Remove containers started by this service on this host whose process is gone.
+
+    Sandboxes are listed first, so that one whose agent container is not listed right after
+    was left behind rather than started in between.
+    """
+    docker_client = docker_from_env()
+    sandboxes = docker_client.containers.list(
+        all=True, filters={"name": f"{SANDBOX_NAME_PREFIX}{SESSION_PREFIX}"}
+    )
+    containers = docker_client.containers.list(all=True, filters={"label": MANAGED_LABEL})
+    orphans = [container for container in containers if _is_orphan(container)]
+    if orphans:
+        logger.info(f"Reaping {len(orphans)} orphaned containers")
+        reap_containers(orphans)
+
+    sessions = {container.labels.get(SESSION_LABEL) for container in containers} - {None}
+    stray_sandboxes = [
+        sandbox
+        for sandbox in sandboxes
+        if not any(
+            sandbox.name.startswith(f"{SANDBOX_NAME_PREFIX}{session}-") for session in sessions
+        )
+    ]
+    if stray_sandboxes:
+        logger.info(f"Reaping {len(stray_sandboxes)} sandboxes without an agent container")
+        _remove_containers(stray_sandboxes)
+
+
+def _sweep_periodically() -> None:
+    while True:
+        try:
+            sweep_orphan_containers()
+        except Exception as e:
+            logger.error(f"Failed to sweep orphaned containers: {e}")
+        time.sleep(SETTINGS.container_sweep_interval)
+
+
+def start_orphan_sweeper() -> None:
+    """Start the background orphan sweep once per process."""
+    if _sweeper_started.is_set():
+        return
+    _sweeper_started.set()
+    threading.Thread(target=_sweep_periodically, name="container-sweeper", daemon=True).start()
+
+
+def _prune_logs(log_dir: Path, keep: int) -> None:
+    """Delete the oldest container logs in ``log_dir`` until at most ``keep`` are left."""
+    paths = []
+    for path in log_dir.glob("*.log.gz"):
+        try:
+            paths.append((path.stat().st_mtime, path))
+        except OSError:
+            continue
+    for _, path in sorted(paths)[: max(len(paths) - keep, 0)]:
+        try:
+            path.unlink()
+        except OSError:
+            continue
+
+
+def agent_session(repo_directory: str) -> str:
+    """The agent session name for ``repo_directory``, shared by the solves run in it.
+
+    Warm containers are started before their solve command is known, so the session is derived
+    from the workspace both are given rather than from the container name.
+    """
+    digest = hashlib.sha256(os.path.abspath(repo_directory).encode()).hexdigest()[:16]
+    return f"{SESSION_PREFIX}{digest}"
+
+
+def _log_path(name: str) -> Path:
+    log_dir = Path(os.path.expanduser(SETTINGS.container_log_dir))
+    log_dir.mkdir(parents=True, exist_ok=True)
+    _prune_logs(log_dir, SETTINGS.container_log_retention_count - 1)
+    return log_dir / f"{name}-{datetime.now().strftime('%Y%m%d%H%M%S')}.log.gz"
+
+
+def _pull_image(docker_client, image: str, reference: str) -> None:
+    digest = SETTINGS.agent_image_digests.get(image)
+    try:
+        pulled = docker_client.images.pull(reference)
+    except DockerException as e:
+        try:
+            pulled = docker_client.images.get(reference)
+        except DockerException:
+            logger.warning(f"Image {reference} could not be pulled and is not available: {e}")
+            return
+        logger.info(f"Image {reference} is not pullable, using the local copy")
+
+    if digest and not any(d.endswith(f"@{digest}") for d in pulled.attrs.get("RepoDigests", [])):
+        raise ValueError(f"Image {reference} does not match the pinned digest {digest}")
+    logger.info(f"Image {reference} is ready")
+
+
+def pre_pull_images(images: dict[str, str]) -> None:
+    """Pull agent images in parallel, verifying pinned digests.
+
+    ``images`` maps each image name to the reference containers are started from, which is
+    ``repository@digest`` for pinned images. An image that cannot be pulled now is pulled when
+    it is first run; only an image that does not match its pinned digest is refused.
+    """
+    try:
+        docker_client = docker_from_env()
+    except DockerException as e:
+        logger.warning(f"Docker is not available, images will be pulled when first run: {e}")
+        return
+
+    with ThreadPoolExecutor(max_workers=max(len(images), 1)) as executor:
+        futures = {
+            reference: executor.submit(_pull_image, docker_client, image, reference)
+            for image, reference in images.items()
+        }
+        for reference, future in futures.items():
+            try:
+                future.result()
+            except ValueError as e:
+                logger.error(f"Refusing image {reference}: {e}")
+                _refused_images.add(reference)
+            except Exception as e:
+                logger.warning(
+                    f"Failed to pull image {reference}, it is pulled when first run: {e}"
+                )
+
+
+def _check_image(kwargs: dict) -> None:
+    if kwargs.get("image") in _refused_images:
+        raise ValueError(f"Image {kwargs['image']} does not match its pinned digest")
+
+
+def start_idle_container(**kwargs):
+    """Start an agent container that idles until a command is executed in it."""
+    _check_image(kwargs)
+    docker_client = docker_from_env()
+    kwargs["labels"] = {**kwargs.get("labels", {}), **_container_labels(None)}
+    kwargs["entrypoint"] = ["sleep", "infinity"]
+    return docker_client.containers.run(**kwargs, tty=True, detach=True)
+
+
+def _exec_in_container(container, kwargs: dict) -> tuple[str, object]:
+    api = container.client.api
+    exec_id = api.exec_create(
+        container.id,
+        kwargs["entrypoint"],
+        environment=kwargs.get("environment"),
+        user=kwargs.get("user", ""),
+        tty=True,
+    )["Id"]
+    return exec_id, api.exec_start(exec_id, stream=True, tty=True)
 
 
 def launch_container_with_repo_mounted(
     timeout: int = 3600,
+    instance_id: Optional[str] = None,
+    warm_container=None,
     **kwargs,
-) -> str:
-    docker_client = docker_from_env()
-    logger.info("Launching container")
-    container = docker_client.containers.run(
-        **kwargs,
-        tty=True,
-        stdin_open=True,
-        detach=True,
+) -> tuple[str, str, int]:
+    """Run the agent and return its summarized logs, the raw log tail and the log size in bytes."""
+    if warm_container is None:
+        _check_image(kwargs)
+        docker_client = docker_from_env()
+        logger.info("Launching container")
+        kwargs["labels"] = {**kwargs.get("labels", {}), **_container_labels(instance_id)}
+        container = docker_client.containers.run(
+            **kwargs,
+            tty=True,
+            stdin_open=True,
+            detach=True,
+        )
+        logger.info("Container launched")
+        stream = container.logs(stream=True, follow=True)
+    else:
+        container = warm_container
+        logger.info(f"Running agent in warm container {container.name}")
+        exec_id, stream = _exec_in_container(container, kwargs)
+
+    log_capture = _LogCapture(
+        stream,
+        _log_path(instance_id or container.name),
+        SETTINGS.container_log_tail_bytes,
+        SETTINGS.container_log_max_bytes,
     )
-    logger.info("Container launched")
+    log_capture.start()
 
     try:
         logger.info(f"Waiting for container to finish (timeout: {timeout}s)")
-        result = container.wait(timeout=timeout)
-        logger.info(f"Container exited with status code: {result['StatusCode']}")
+        if warm_container is None:
+            status_code = container.wait(timeout=timeout)["StatusCode"]
+            log_capture.join(timeout=30)
+        else:
+            log_capture.join(timeout=timeout)
+            if log_capture.is_alive():
+                raise ReadTimeout()
+            status_code = container.client.api.exec_inspect(exec_id)["ExitCode"]
+        logger.info(f"Container exited with status code: {status_code}")
 
-        raw_logs = container.logs(stream=False).decode("utf-8")
-        logger.info(f"Raw logs: {raw_logs}")
+        raw_logs = log_capture.tail()
+        logger.info(f"Container logs ({log_capture.total_bytes} bytes) saved to {log_capture.path}")
+        if log_capture.token_line:
+            logger.info(f"Agent token usage: {log_capture.token_line}")
+        logger.debug(f"Raw logs tail: {raw_logs}")
 
-        if result["StatusCode"] != 0:
-            raise Exception(f"Container exited with non-zero status code: {result['StatusCode']}")
+        if status_code != 0:
+            raise Exception(f"Container exited with non-zero status code: {status_code}")
 
         logs = _clean_logs(raw_logs)
         logger.info(f"Clean logs: {logs}")
@@ -80,10 +477,8 @@ def launch_container_with_repo_mounted(
         raise
 
     finally:
-        logger.info("Removing all containers")
-        for container in docker_client.containers.list(all=True):
-            container.stop()
-            container.remove()
-        logger.info("Containers removed")
+        # Warm containers are reaped by the pool when their workspace is released.
+        if warm_container is None:
+            reap_containers([container])
 
-    return logs, raw_logs
+    return logs, raw_logs, log_capture.total_bytes
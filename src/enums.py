@@ -18,3 +18,28 @@ class AgentType(str, Enum):
 class ProviderType(str, Enum):
     OPENAI = "openai"
     LITELLM = "litellm"
+
+
+class RequestPriority(str, Enum):
+    high = "high"
+    low = "low"
+
+
+class SchedulePolicy(str, Enum):
+    fifo = "fifo"
+    reward = "reward"
+    margin_per_minute = "margin-per-minute"
+
+
+class CloneStrategy(str, Enum):
+    auto = "auto"
+    full = "full"
+    shallow = "shallow"
+    blobless = "blobless"
+    treeless = "treeless"
+
+
+class OwnershipMode(str, Enum):
+    chown = "chown"
+    normalize = "normalize"
+    skip = "skip"
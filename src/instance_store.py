@@ -0,0 +1,122 @@
+import json
+import os
+import sqlite3
+import time
+from contextlib import closing
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+from src.config import SETTINGS
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS instances (
+    instance_id TEXT PRIMARY KEY,
+    instance TEXT,
+    instance_fetched_at REAL NOT NULL DEFAULT 0,
+    handled_chat_timestamp TEXT,
+    pr_url TEXT,
+    pr_checked_at REAL NOT NULL DEFAULT 0,
+    solve_started_at REAL,
+    solved_at REAL,
+    outcome TEXT,
+    pending_reply TEXT,
+    updated_at REAL NOT NULL
+)
+"""
+_COLUMNS = (
+    "instance",
+    "instance_fetched_at",
+    "handled_chat_timestamp",
+    "pr_url",
+    "pr_checked_at",
+    "solve_started_at",
+    "solved_at",
+    "outcome",
+    "pending_reply",
+)
+# Columns added after the table was first created, with their types.
+_ADDED_COLUMNS = {"pending_reply": "TEXT"}
+
+
+@dataclass
+class InstanceRecord:
+    """What this provider last knew about an awarded instance.
+
+    ``handled_chat_timestamp`` is the timestamp of the newest chat message that needs no more
+    work, either because a solve addressed it or because nothing had to be done; an empty chat
+    is recorded as an empty string. ``pending_reply`` holds a reply to the requester that could
+    not be sent yet.
+    """
+
+    instance_id: str
+    instance: Optional[dict] = None
+    instance_fetched_at: float = 0.0
+    handled_chat_timestamp: Optional[str] = None
+    pr_url: Optional[str] = None
+    pr_checked_at: float = 0.0
+    solve_started_at: Optional[float] = None
+    solved_at: Optional[float] = None
+    outcome: Optional[str] = None
+    pending_reply: Optional[str] = None
+
+
+def _connect() -> sqlite3.Connection:
+    path = Path(os.path.expanduser(SETTINGS.instance_store_db))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_SCHEMA)
+    existing = {row[1] for row in conn.execute("PRAGMA table_info(instances)")}
+    for column, column_type in _ADDED_COLUMNS.items():
+        if column not in existing:
+            conn.execute(f"ALTER TABLE instances ADD COLUMN {column} {column_type}")
+    return conn
+
+
+def get(instance_id: str) -> Optional[InstanceRecord]:
+    with closing(_connect()) as conn:
+        row = conn.execute(
+            f"SELECT {', '.join(_COLUMNS)} FROM instances WHERE instance_id = ?",
+            (str(instance_id),),
+        ).fetchone()
+    if row is None:
+        return None
+
+    fields = dict(zip(_COLUMNS, row))
+    fields["instance"] = json.loads(fields["instance"]) if fields["instance"] else None
+    return InstanceRecord(instance_id=str(instance_id), **fields)
+
+
+def update(instance_id: str, **fields: Any) -> None:
+    """Set ``fields`` of the record of ``instance_id``, creating it if needed."""
+    unknown = set(fields) - set(_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unknown instance store fields: {', '.join(sorted(unknown))}")
+    if "instance" in fields and fields["instance"] is not None:
+        fields["instance"] = json.dumps(fields["instance"])
+
+    columns = ["instance_id", *fields, "updated_at"]
+    assignments = ", ".join(f"{column} = excluded.{column}" for column in [*fields, "updated_at"])
+    with closing(_connect()) as conn:
+        conn.execute(
+            f"INSERT INTO instances ({', '.join(columns)})"
+            f" VALUES ({', '.join('?' for _ in columns)})"
+            f" ON CONFLICT(instance_id) DO UPDATE SET {assignments}",
+            (str(instance_id), *fields.values(), time.time()),
+        )
+
+
+def forget_instances(keep: Iterable[str]) -> int:
+    """Drop the stored instance payload of every instance not in ``keep``.
+
+    Returns the number of payloads dropped, which are fetched again if they are needed.
+    """
+    keep = [str(instance_id) for instance_id in keep]
+    with closing(_connect()) as conn:
+        cursor = conn.execute(
+            "UPDATE instances SET instance = NULL, instance_fetched_at = 0, updated_at = ?"
+            f" WHERE instance IS NOT NULL AND instance_id NOT IN ({', '.join('?' for _ in keep)})",
+            (time.time(), *keep),
+        )
+        return cursor.rowcount
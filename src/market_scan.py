@@ -1,54 +1,157 @@
 import asyncio
 
 import httpx
+import tenacity
 from loguru import logger
 
 from src import utils
 from src.config import SETTINGS, Settings
+from src.utils import market_api
+from src.utils.git import retry_if_transient_error
 from src.utils.pricing import PricingStrategy
 
-TIMEOUT = httpx.Timeout(10.0)
 pricing_strategy = PricingStrategy(SETTINGS.openrouter_api_key)
 
 
-async def _create_proposal_for_instance(instance: dict, settings: Settings) -> None:
+def _wait_for_retry(retry_state: tenacity.RetryCallState) -> float:
+    """Wait as long as the market asks in Retry-After, or back off exponentially."""
+    response = getattr(retry_state.outcome.exception(), "response", None)
+    if response is not None and "Retry-After" in response.headers:
+        try:
+            return min(float(response.headers["Retry-After"]), SETTINGS.market_retry_max_wait)
+        except ValueError:
+            pass
+    return tenacity.wait_exponential(multiplier=0.5, max=SETTINGS.market_retry_max_wait)(
+        retry_state
+    )
+
+
+def _retry_market(predicate):
+    return tenacity.retry(
+        retry=tenacity.retry_if_exception(predicate),
+        wait=_wait_for_retry,
+        stop=tenacity.stop_after_attempt(SETTINGS.market_retries),
+        before_sleep=lambda retry_state: logger.warning(
+            f"Market request failed ({retry_state.outcome.exception()!r}), "
+            f"retrying in {retry_state.next_action.sleep:.1f}s"
+        ),
+        reraise=True,
+    )
+
+
+def _not_processed(exception: BaseException) -> bool:
+    """Whether a failed request certainly did not reach the market or was turned away by it.
+
+    Only these are safe to repeat for requests that are not idempotent: a request that timed
+    out after it was sent may still have been applied.
+    """
+    if isinstance(exception, (httpx.ConnectError, httpx.ConnectTimeout, httpx.PoolTimeout)):
+        return True
+    return isinstance(exception, httpx.HTTPStatusError) and exception.response.status_code in {
+        httpx.codes.TOO_MANY_REQUESTS,  # 429
+        httpx.codes.SERVICE_UNAVAILABLE,  # 503
+    }
+
+
+_retry_transient = _retry_market(retry_if_transient_error)
+retry_not_processed = _retry_market(_not_processed)
+
+
+@_retry_transient
+async def _get(path: str, params: dict | None = None) -> httpx.Response:
+    response = await market_api.get_async_client().get(path, params=params)
+    response.raise_for_status()
+    return response
+
+
+@retry_not_processed
+async def _post(path: str, data: dict) -> httpx.Response:
+    response = await market_api.get_async_client().post(path, json=data)
+    response.raise_for_status()
+    return response
+
+
+async def _create_proposal_for_instance(instance: dict, settings: Settings) -> bool:
     instance_id = instance["id"]
     if not utils.find_github_repo_url(instance["background"]):
         logger.info("Instance id {} does not have a github repo url", instance_id)
-        return
+        return False
 
     logger.info("Creating proposal for instance id: {}", instance_id)
 
     bid = pricing_strategy.calculate_next_bid()
     logger.info(f"Calculated bid for instance {instance_id}: {bid}")
 
-    headers = {
-        "x-api-key": settings.market_api_key,
-        "Accept": "application/json",
-    }
-    url = f"{settings.market_url}/v1/proposals/create/for-instance/{instance_id}"
     data = {
         "max_bid": bid,
     }
-    async with httpx.AsyncClient() as client:
-        response = await client.post(url, headers=headers, json=data)
-
-    response.raise_for_status()
+    await _post(f"/v1/proposals/create/for-instance/{instance_id}", data)
     logger.info(f"Proposal for instance id {instance_id} created successfully")
+    return True
+
+
+async def _create_proposals_in_batches(instances: list[dict], settings: Settings) -> list:
+    """Submit proposals through the market's batch endpoint, one result per instance."""
+    proposable = [
+        (index, instance)
+        for index, instance in enumerate(instances)
+        if utils.find_github_repo_url(instance["background"])
+    ]
+    results: list = [False] * len(instances)
+
+    batch_size = settings.market_proposal_batch_size
+    for start in range(0, len(proposable), batch_size):
+        batch = proposable[start : start + batch_size]
+        data = {
+            "proposals": [
+                {"instance_id": instance["id"], "max_bid": pricing_strategy.calculate_next_bid()}
+                for _, instance in batch
+            ]
+        }
+        try:
+            await _post(settings.market_proposal_batch_path, data)
+            outcome = True
+            logger.info(f"Submitted a batch of {len(batch)} proposals")
+        except Exception as e:
+            outcome = e
+            logger.warning(f"Failed to submit a batch of {len(batch)} proposals: {e!r}")
+        for index, _ in batch:
+            results[index] = outcome
+    return results
+
+
+async def _create_proposals(instances: list[dict], settings: Settings) -> None:
+    """Create proposals with bounded concurrency, reporting the outcome of every instance."""
+    if settings.market_proposal_batch_path:
+        results = await _create_proposals_in_batches(instances, settings)
+    else:
+        semaphore = asyncio.Semaphore(settings.market_proposal_concurrency)
+
+        async def create(instance: dict) -> bool:
+            async with semaphore:
+                return await _create_proposal_for_instance(instance, settings)
+
+        results = await asyncio.gather(
+            *(create(instance) for instance in instances), return_exceptions=True
+        )
+
+    created = 0
+    failed = 0
+    for instance, result in zip(instances, results):
+        if isinstance(result, Exception):
+            failed += 1
+            logger.error(f"Failed to create proposal for instance id {instance['id']}: {result!r}")
+        elif result:
+            created += 1
+    logger.info(
+        f"Created {created} proposals for {len(instances)} unfilled instances ({failed} failed)"
+    )
 
 
 async def async_market_scan_handler() -> None:
-    headers = {
-        "x-api-key": SETTINGS.market_api_key,
-        "Accept": "application/json",
-    }
-    url = f"{SETTINGS.market_url}/v1/instances/"
     params = {"instance_status": SETTINGS.market_open_instance_code}
 
-    async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-        response = await client.get(url, headers=headers, params=params)
-
-    response.raise_for_status()
+    response = await _get("/v1/instances/", params=params)
     open_instances = response.json()
 
     if not open_instances:
@@ -56,21 +159,22 @@ async def async_market_scan_handler() -> None:
         return
 
     logger.debug(f"Found {len(open_instances)} open instances")
-    url = f"{SETTINGS.market_url}/v1/proposals/"
-    async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-        response = await client.get(url, headers=headers)
-
-    response.raise_for_status()
+    response = await _get("/v1/proposals/")
     proposals = response.json()
 
     filled_instances = set(proposal["instance_id"] for proposal in proposals)
-    tasks = [
-        _create_proposal_for_instance(instance, SETTINGS)
-        for instance in open_instances
-        if instance["id"] not in filled_instances
-    ]
-    await asyncio.gather(*tasks)
+    await _create_proposals(
+        [instance for instance in open_instances if instance["id"] not in filled_instances],
+        SETTINGS,
+    )
+
+
+async def _market_scan_and_close() -> None:
+    try:
+        await async_market_scan_handler()
+    finally:
+        await market_api.aclose_async_client()
 
 
 def market_scan_handler() -> None:
-    asyncio.run(async_market_scan_handler())
+    asyncio.run(_market_scan_and_close())
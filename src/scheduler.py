@@ -0,0 +1,41 @@
+from datetime import datetime, timezone
+from typing import Optional
+
+from src.enums import SchedulePolicy
+
+
+def parse_timestamp(value: Optional[str]) -> Optional[datetime]:
+    """Parse a market ISO timestamp into a naive UTC datetime, or None if it is unusable."""
+    if not value:
+        return None
+    try:
+        timestamp = datetime.fromisoformat(value.replace("Z", "+00:00"))
+    except ValueError:
+        return None
+    if timestamp.tzinfo is not None:
+        timestamp = timestamp.astimezone(timezone.utc).replace(tzinfo=None)
+    return timestamp
+
+
+def instance_priority(
+    policy: SchedulePolicy,
+    reward: float,
+    estimated_cost: float,
+    expected_minutes: float,
+    waiting_hours: float,
+    aging_per_hour: float,
+) -> float:
+    """Score an awarded instance; the solver takes higher scores first.
+
+    ``reward`` scores by credit alone, while ``margin_per_minute`` scores by the expected profit
+    per minute of container time, which favours short follow-ups over long cold starts of the
+    same value. Both add ``aging_per_hour`` for every hour the requester has been waiting so
+    that low-value instances are not starved. ``fifo`` keeps the order of the market.
+    """
+    if policy == SchedulePolicy.fifo:
+        return 0.0
+
+    aging = aging_per_hour * max(waiting_hours, 0.0)
+    if policy == SchedulePolicy.reward:
+        return reward + aging
+    return (reward - estimated_cost) / max(expected_minutes, 1.0) + aging
@@ -1,23 +1,29 @@
+import asyncio
 import os
-import tempfile
+import time
 from dataclasses import dataclass
 from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Callable, Optional
 
-import httpx
 from loguru import logger
 
-from src import agents, utils
+from src import agents, instance_store, utils
 from src.config import SETTINGS, Settings
-from src.containers import launch_container_with_repo_mounted
-from src.enums import AgentType
-from src.market_scan import pricing_strategy
-
-TIMEOUT = httpx.Timeout(10.0)
+from src.containers import launch_container_with_repo_mounted, pre_pull_images
+from src.enums import AgentType, OwnershipMode
+from src.market_scan import pricing_strategy, retry_not_processed
+from src.scheduler import instance_priority, parse_timestamp
+from src.utils import market_api
+from src.utils.llm_cache import cache_stats
+from src.utils.tokens import count_tokens
+from src.warm_pool import WarmContainerPool, solve_workspace
+from src.worker_pool import SolveWorkerPool
 
 DEFAULT_MODEL = "anthropic/claude-3.5-sonnet"
 
+solve_pool = SolveWorkerPool(SETTINGS.max_concurrent_solves)
+
 
 @dataclass
 class InstanceToSolve:
@@ -27,113 +33,198 @@ class InstanceToSolve:
     pr_comments: Optional[str] = None
     messages_with_requester: Optional[str] = None
     started_solving: bool = False
+    waiting_since: Optional[datetime] = None
+    chat_timestamp: str = ""
 
 
-def fetch_model_prices(openrouter_api_key: str) -> List[Dict]:
-    """Fetch current model prices from OpenRouter API."""
-    try:
-        with httpx.Client() as client:
-            response = client.get(
-                "https://openrouter.ai/api/v1/models",
-                headers={"Authorization": f"Bearer {openrouter_api_key}"},
-            )
-            response.raise_for_status()
-            data = response.json()
-            # OpenRouter API returns data in a 'data' field
-            return data.get("data", [])
-    except Exception as e:
-        logger.error(f"Error fetching model prices: {e}")
-        raise
+async def _get_instance(instance_id: str, settings: Settings) -> dict:
+    record = await asyncio.to_thread(instance_store.get, instance_id)
+    if (
+        record
+        and record.instance
+        and time.time() - record.instance_fetched_at < settings.instance_refresh_interval
+    ):
+        return record.instance
 
+    response = await market_api.get_async_client().get(f"/v1/instances/{instance_id}")
+    response.raise_for_status()
+    instance = response.json()
+    await asyncio.to_thread(
+        instance_store.update, instance_id, instance=instance, instance_fetched_at=time.time()
+    )
+    return instance
 
-def _get_instance_to_solve(instance_id: str, settings: Settings) -> Optional[InstanceToSolve]:
-    headers = {
-        "x-api-key": settings.market_api_key,
-    }
-    with httpx.Client(timeout=TIMEOUT) as client:
-        instance_endpoint = f"{settings.market_url}/v1/instances/{instance_id}"
-        response = client.get(instance_endpoint, headers=headers)
-        instance = response.json()
 
-        if instance["status"] != settings.market_resolved_instance_code:
-            return None
+async def _get_instance_to_solve(
+    instance_id: str, settings: Settings
+) -> Optional[InstanceToSolve]:
+    instance = await _get_instance(instance_id, settings)
+
+    if instance["status"] != settings.market_resolved_instance_code:
+        return None
 
     repo_url = utils.find_github_repo_url(instance["background"])
     if not repo_url:
         logger.info(f"Instance id {instance_id} does not have a github repo url")
         return InstanceToSolve(instance=instance)
 
-    with httpx.Client(timeout=TIMEOUT) as client:
-        chat_endpoint = f"{settings.market_url}/v1/chat/{instance_id}"
-        response = client.get(chat_endpoint, headers=headers)
-
-        chat = response.json()
-        if not chat:
-            return InstanceToSolve(instance=instance, repo_url=repo_url)
-
-        messages_from_provider_present = any(message["sender"] == "provider" for message in chat)
-        logger.info(
-            f"Instance id {instance_id} messages from provider: {messages_from_provider_present}"
-        )
+    response = await market_api.get_async_client().get(f"/v1/chat/{instance_id}")
+    response.raise_for_status()
 
-        messages_with_requester = (
-            utils.format_messages(chat)
-            if sorted(chat, key=lambda m: m["timestamp"])[-1]["sender"] == "requester"
-            else None
+    chat = response.json()
+    chat_timestamp = max((message["timestamp"] for message in chat), default="")
+
+    record = await asyncio.to_thread(instance_store.get, instance_id)
+    if record and record.pending_reply:
+        # The chat changes once the reply is sent, so the instance is looked at again next cycle.
+        await _send_pending_reply(record, settings)
+        return None
+    if record and record.handled_chat_timestamp == chat_timestamp:
+        pr_check_due = (
+            record.pr_url
+            and time.time() - record.pr_checked_at >= settings.pr_comments_poll_interval
         )
-        logger.info(f"Messages with requester: {messages_with_requester}")
+        if not pr_check_due:
+            logger.debug(f"Instance id {instance_id} is unchanged since it was last handled")
+            return None
 
-        formatted_messages = utils.format_messages(chat)
-        pr_url = utils.get_pr_url(formatted_messages)
-        logger.info(
-            "PR URL {} found {} for instance id {}. Looking for PR comments".format(
-                "NOT" if not pr_url else "", pr_url if pr_url else "", instance_id
-            )
-        )
+    if not chat:
+        return InstanceToSolve(instance=instance, repo_url=repo_url)
 
-        if not pr_url:
-            return InstanceToSolve(
-                instance=instance,
-                repo_url=repo_url,
-                messages_with_requester=messages_with_requester,
-                started_solving=messages_from_provider_present,
-            )
+    messages_from_provider_present = any(message["sender"] == "provider" for message in chat)
+    logger.info(
+        f"Instance id {instance_id} messages from provider: {messages_from_provider_present}"
+    )
 
-        logger.info(f"Looking for PR comments in chat with instance id {instance_id}")
-        pr_comments = utils.get_last_pr_comments(pr_url, settings.github_pat)
-        pr_comments = pr_comments if pr_comments else None
-        logger.info(
-            "PR comments {} found {} for instance id {}".format(
-                "NOT" if not pr_comments else "", pr_comments if pr_comments else "", instance_id
-            )
+    last_message = sorted(chat, key=lambda m: m["timestamp"])[-1]
+    messages_with_requester = (
+        utils.format_messages(chat) if last_message["sender"] == "requester" else None
+    )
+    waiting_since = parse_timestamp(last_message["timestamp"]) if messages_with_requester else None
+    logger.info(f"Messages with requester: {messages_with_requester}")
+
+    formatted_messages = utils.format_messages(chat)
+    pr_url = utils.get_pr_url(formatted_messages)
+    logger.info(
+        "PR URL {} found {} for instance id {}. Looking for PR comments".format(
+            "NOT" if not pr_url else "", pr_url if pr_url else "", instance_id
         )
+    )
+
+    if not pr_url:
         return InstanceToSolve(
             instance=instance,
             repo_url=repo_url,
-            pr_url=pr_url,
-            pr_comments=pr_comments,
             messages_with_requester=messages_with_requester,
             started_solving=messages_from_provider_present,
+            waiting_since=waiting_since,
+            chat_timestamp=chat_timestamp,
         )
 
+    logger.info(f"Looking for PR comments in chat with instance id {instance_id}")
+    pr_comments = await asyncio.to_thread(
+        utils.get_last_pr_comments, pr_url, settings.github_pat
+    )
+    if pr_comments is None:
+        logger.info(f"Postponing instance id {instance_id} until its PR comments can be checked")
+        return None
+    await asyncio.to_thread(
+        instance_store.update, instance_id, pr_url=pr_url, pr_checked_at=time.time()
+    )
+    pr_comments = pr_comments if pr_comments else None
+    logger.info(
+        "PR comments {} found {} for instance id {}".format(
+            "NOT" if not pr_comments else "", pr_comments if pr_comments else "", instance_id
+        )
+    )
+    return InstanceToSolve(
+        instance=instance,
+        repo_url=repo_url,
+        pr_url=pr_url,
+        pr_comments=pr_comments,
+        messages_with_requester=messages_with_requester,
+        started_solving=messages_from_provider_present,
+        waiting_since=waiting_since,
+        chat_timestamp=chat_timestamp,
+    )
 
-def estimate_tokens(text: str) -> tuple[int, int]:
-    """Rough estimation of input and output tokens."""
-    input_tokens = len(text) // 4
-    return input_tokens
 
+def estimate_tokens(text: str) -> int:
+    return count_tokens(text)
 
-def _solve_instance(
-    instance_to_solve: InstanceToSolve,
-    settings: Settings,
-) -> None:
+
+def _estimate_output_tokens(raw_logs: str, log_bytes: int) -> int:
+    """Estimate the tokens of the whole agent output from the density of its in-memory tail."""
+    tail_bytes = len(raw_logs.encode("utf-8"))
+    if not tail_bytes or not log_bytes:
+        return 0
+    return round(estimate_tokens(raw_logs) * max(log_bytes, tail_bytes) / tail_bytes)
+
+
+def _input_text(instance_to_solve: InstanceToSolve) -> str:
     input_text = instance_to_solve.instance["background"]
     if instance_to_solve.pr_comments:
         input_text += "\n" + instance_to_solve.pr_comments
     if instance_to_solve.messages_with_requester:
         input_text += "\n" + instance_to_solve.messages_with_requester
+    return input_text
+
+
+def _schedule_priority(
+    instance_to_solve: InstanceToSolve, settings: Settings
+) -> Callable[[], float]:
+    """The score of ``instance_to_solve`` as a function of the time it is taken from the queue.
+
+    The cost is estimated once, while the waiting time keeps growing as the instance is queued.
+    """
+    model_name = settings.foundation_model_name.value if settings.foundation_model_name else ""
+    try:
+        estimated_cost = pricing_strategy.estimate_cost(
+            model_name,
+            estimate_tokens(_input_text(instance_to_solve)),
+            settings.schedule_expected_output_tokens,
+        )
+    except RuntimeError as e:
+        logger.warning(f"Ranking instance id {instance_to_solve.instance['id']} without cost: {e}")
+        estimated_cost = 0.0
+    expected_minutes = (
+        settings.schedule_follow_up_minutes
+        if instance_to_solve.started_solving
+        else settings.schedule_cold_start_minutes
+    )
+    reward = float(instance_to_solve.instance.get("max_credit_per_instance") or 0)
+    waiting_since = instance_to_solve.waiting_since
+
+    def priority() -> float:
+        waiting_hours = 0.0
+        if waiting_since:
+            waiting_hours = (datetime.utcnow() - waiting_since).total_seconds() / 3600
+        return instance_priority(
+            settings.schedule_policy,
+            reward,
+            estimated_cost,
+            expected_minutes,
+            waiting_hours,
+            settings.schedule_aging_per_hour,
+        )
+
+    return priority
+
+
+def _fix_workspace_ownership(repo_path: Path, settings: Settings) -> None:
+    if settings.ownership_mode == OwnershipMode.chown:
+        utils.change_directory_ownership_recursive(repo_path, os.getuid(), os.getgid())
+    elif settings.ownership_mode == OwnershipMode.normalize:
+        utils.normalize_ownership(
+            repo_path, os.getuid(), os.getgid(), workers=settings.ownership_workers
+        )
 
-    input_tokens = estimate_tokens(input_text)
+
+def _solve_instance(
+    instance_to_solve: InstanceToSolve,
+    settings: Settings,
+) -> None:
+    input_tokens = estimate_tokens(_input_text(instance_to_solve))
 
     logger.info("Solving instance id: {}", instance_to_solve.instance["id"])
     solver_command = utils.build_solver_command(
@@ -146,11 +237,16 @@ def _solve_instance(
     forked_repo_url = utils.fork_repo(instance_to_solve.repo_url, settings.github_pat)
     logger.info(f"Forked repo url: {forked_repo_url}")
     forked_repo_name = utils.extract_repo_name_from_url(forked_repo_url)
-    with tempfile.TemporaryDirectory() as temp_dir:
+    with solve_workspace(warm_pool) as (temp_dir, warm_container):
         repo_absolute_path = Path(temp_dir)
         logger.info(f"Cloning repository {forked_repo_url} to {repo_absolute_path}")
 
-        utils.clone_repository(forked_repo_url, str(repo_absolute_path), settings.github_pat)
+        utils.clone_repository(
+            forked_repo_url,
+            str(repo_absolute_path),
+            settings.github_pat,
+            path_hints=utils.extract_path_hints(instance_to_solve.instance["background"]),
+        )
         utils.create_and_push_branch(
             repo_absolute_path, instance_to_solve.instance["id"], settings.github_pat
         )
@@ -168,7 +264,7 @@ def _solve_instance(
                 Path(os.path.dirname(os.path.abspath(__file__))) / "agents" / "aider_modify_repo.py"
             )
             utils.copy_file_to_directory(modify_repo_absolute_path, repo_absolute_path)
-            utils.change_directory_ownership_recursive(repo_absolute_path, os.getuid(), os.getgid())
+            _fix_workspace_ownership(repo_absolute_path, settings)
 
             test_command = agents.aider_suggest_test_command(str(repo_absolute_path))
             container_kwargs = agents.aider_get_container_kwargs(
@@ -179,26 +275,31 @@ def _solve_instance(
                 settings.architect_model_name.value,
             )
         elif settings.agent_type == AgentType.raaid:
-            utils.change_directory_ownership_recursive(repo_absolute_path, os.getuid(), os.getgid())
+            _fix_workspace_ownership(repo_absolute_path, settings)
             container_kwargs = agents.raaid_get_container_kwargs(
                 str(repo_absolute_path),
                 solver_command,
                 settings.foundation_model_name,
             )
 
-        logs, raw_logs = launch_container_with_repo_mounted(**container_kwargs)
+        logs, raw_logs, log_bytes = launch_container_with_repo_mounted(
+            instance_id=instance_to_solve.instance["id"],
+            warm_container=warm_container,
+            **container_kwargs,
+        )
 
-        if raw_logs:
-            output_tokens = estimate_tokens(raw_logs)
-        else:
-            output_tokens = 0
+        output_tokens = _estimate_output_tokens(raw_logs, log_bytes)
 
-        estimated_cost = pricing_strategy.estimate_cost(
-            settings.foundation_model_name.value, input_tokens, output_tokens
-        )
+        try:
+            estimated_cost = pricing_strategy.estimate_cost(
+                settings.foundation_model_name.value, input_tokens, output_tokens
+            )
+        except RuntimeError as e:
+            logger.warning(f"Not judging the profitability of the solve: {e}")
+            estimated_cost = None
 
         current_bid = pricing_strategy.calculate_next_bid()
-        was_profitable = current_bid > estimated_cost if estimated_cost > 0 else None
+        was_profitable = current_bid > estimated_cost if estimated_cost is not None else None
 
         logger.info(
             "Instance {} - Estimated cost: {}, Current bid: {}, Reward: {}, Profitable: {}",
@@ -244,13 +345,38 @@ def _solve_instance(
             return logs
 
 
-def get_awarded_proposals(settings: Settings) -> list[dict]:
-    headers = {
-        "x-api-key": settings.market_api_key,
-    }
-    url = f"{settings.market_url}/v1/proposals/"
+async def _prefetch_instances_to_solve(
+    instance_ids: list[str], settings: Settings
+) -> list[InstanceToSolve]:
+    """Resolve awarded instances concurrently, dropping the ones that fail or time out."""
+    semaphore = asyncio.Semaphore(settings.prefetch_concurrency)
+
+    async def prefetch(instance_id: str) -> Optional[InstanceToSolve]:
+        async with semaphore:
+            return await asyncio.wait_for(
+                _get_instance_to_solve(instance_id, settings), timeout=settings.prefetch_timeout
+            )
 
-    response = httpx.get(url, headers=headers)
+    results = await asyncio.gather(
+        *(prefetch(instance_id) for instance_id in instance_ids), return_exceptions=True
+    )
+
+    instances_to_solve = []
+    for instance_id, result in zip(instance_ids, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.error(
+                f"Timed out after {settings.prefetch_timeout}s fetching instance id {instance_id}"
+            )
+        elif isinstance(result, Exception):
+            logger.error(f"Error fetching instance id {instance_id}: {result}")
+        elif result:
+            instances_to_solve.append(result)
+    logger.info(f"Prefetched {len(instances_to_solve)} of {len(instance_ids)} awarded instances")
+    return instances_to_solve
+
+
+async def get_awarded_proposals(settings: Settings) -> list[dict]:
+    response = await market_api.get_async_client().get("/v1/proposals/")
     response.raise_for_status()
     all_proposals = response.json()
 
@@ -266,61 +392,157 @@ def get_awarded_proposals(settings: Settings) -> list[dict]:
     return awarded_proposals
 
 
+@retry_not_processed
 def _send_message(instance_id: str, message: str, settings: Settings) -> None:
-    headers = {
-        "x-api-key": settings.market_api_key,
-    }
-    url = f"{settings.market_url}/v1/chat/send-message/{instance_id}"
     data = {"message": message}
 
-    response = httpx.post(url, headers=headers, json=data)
+    response = market_api.get_client().post(f"/v1/chat/send-message/{instance_id}", json=data)
     response.raise_for_status()
 
 
-def solve_instances_handler() -> None:
-    logger.info("Solve instances handler")
+def _still_awarded(instance_id: str, settings: Settings) -> bool:
+    """Whether the market still has ``instance_id`` resolved to us, just before it is solved."""
+    response = market_api.get_client().get(f"/v1/instances/{instance_id}")
+    response.raise_for_status()
+    instance = response.json()
+    instance_store.update(instance_id, instance=instance, instance_fetched_at=time.time())
+    return instance["status"] == settings.market_resolved_instance_code
+
+
+def _solve_and_report(instance_to_solve: InstanceToSolve, settings: Settings) -> None:
+    instance_id = instance_to_solve.instance["id"]
+    if not _still_awarded(instance_id, settings):
+        logger.info(f"Instance id {instance_id} is no longer awarded, not solving it")
+        return
+    instance_store.update(instance_id, solve_started_at=time.time())
+    try:
+        message = _solve_instance(instance_to_solve, settings)
+    except Exception:
+        instance_store.update(instance_id, outcome="failed", solved_at=time.time())
+        raise
+
+    pending_reply = None
+    if message:
+        try:
+            _send_message(instance_id, message, settings)
+        except Exception as e:
+            logger.error(f"Error sending message for instance id {instance_id}, will retry: {e}")
+            pending_reply = message
+    instance_store.update(
+        instance_id,
+        outcome="solved",
+        solved_at=time.time(),
+        handled_chat_timestamp=instance_to_solve.chat_timestamp,
+        pending_reply=pending_reply,
+    )
 
+
+async def _send_pending_reply(record: instance_store.InstanceRecord, settings: Settings) -> None:
+    """Send the reply a solve of ``record`` could not deliver, keeping it if that fails again."""
     try:
-        models_data = fetch_model_prices(SETTINGS.openrouter_api_key)
-        pricing_strategy.update_model_prices(models_data)
+        await asyncio.to_thread(_send_message, record.instance_id, record.pending_reply, settings)
     except Exception as e:
-        logger.error(f"Failed to fetch model prices: {e}")
+        logger.error(f"Error resending message for instance id {record.instance_id}: {e}")
+        return
+    logger.info(f"Sent the pending reply for instance id {record.instance_id}")
+    await asyncio.to_thread(instance_store.update, record.instance_id, pending_reply=None)
+
+
+def _warm_container_kwargs(repo_directory: str) -> dict:
+    """Container kwargs for an idle agent container, before any solver command is known."""
+    if SETTINGS.agent_type == AgentType.open_hands:
+        return agents.open_hands_get_container_kwargs(
+            repo_directory, "", SETTINGS.foundation_model_name
+        )
+    if SETTINGS.agent_type == AgentType.aider:
+        return agents.aider_get_container_kwargs(
+            repo_directory,
+            SETTINGS.foundation_model_name.value,
+            "",
+            "",
+            SETTINGS.architect_model_name.value,
+        )
+    return agents.raaid_get_container_kwargs(repo_directory, "", SETTINGS.foundation_model_name)
 
-    awarded_proposals = get_awarded_proposals(SETTINGS)
+
+warm_pool = WarmContainerPool(SETTINGS.warm_pool_size, _warm_container_kwargs)
+
+
+def prepare_agent_runtime() -> None:
+    """Pull the agent images and start the warm container pool."""
+    if SETTINGS.pre_pull_images:
+        pre_pull_images(agents.AGENT_IMAGES[SETTINGS.agent_type])
+    warm_pool.start()
+
+
+def shutdown_solve_workers(wait: bool = True) -> None:
+    solve_pool.shutdown(wait=wait)
+    warm_pool.shutdown()
+
+
+def _needs_solving(instance_to_solve: InstanceToSolve) -> bool:
+    if not instance_to_solve.repo_url:
+        return False
+
+    pr_interaction = bool(instance_to_solve.pr_url) and bool(instance_to_solve.pr_comments)
+    user_interaction = bool(instance_to_solve.messages_with_requester)
+    return not instance_to_solve.started_solving or pr_interaction or user_interaction
+
+
+async def async_solve_instances_handler() -> None:
+    logger.info("Solve instances handler")
+
+    await asyncio.to_thread(pricing_strategy.start_refresher)
+
+    awarded_proposals = await get_awarded_proposals(SETTINGS)
 
     logger.info(f"Found {len(awarded_proposals)} awarded proposals")
 
+    # A stored instance is reused only while its proposal is awarded, so an instance that was
+    # closed or reassigned on the market is fetched again before it could be solved.
+    forgotten = await asyncio.to_thread(
+        instance_store.forget_instances, [p["instance_id"] for p in awarded_proposals]
+    )
+    if forgotten:
+        logger.info(f"Dropped {forgotten} stored instances that are no longer awarded")
+
+    awarded_at = {}
     for p in awarded_proposals:
-        try:
-            instance_to_solve = _get_instance_to_solve(p["instance_id"], SETTINGS)
-            if not instance_to_solve or not instance_to_solve.repo_url:
-                continue
-
-            pr_interaction = bool(instance_to_solve.pr_url) and bool(instance_to_solve.pr_comments)
-            user_interaction = bool(instance_to_solve.messages_with_requester)
-            if (
-                instance_to_solve.started_solving
-                and (not pr_interaction)
-                and (not user_interaction)
-            ):
-                continue
-
-            message = _solve_instance(
-                instance_to_solve,
-                SETTINGS,
+        if solve_pool.is_pending(p["instance_id"]):
+            logger.info(f"Instance id {p['instance_id']} is already queued or being solved")
+            continue
+        awarded_at[p["instance_id"]] = parse_timestamp(p["creation_date"])
+
+    instances_to_solve = await _prefetch_instances_to_solve(list(awarded_at), SETTINGS)
+    for instance_to_solve in instances_to_solve:
+        if not _needs_solving(instance_to_solve):
+            await asyncio.to_thread(
+                instance_store.update,
+                instance_to_solve.instance["id"],
+                handled_chat_timestamp=instance_to_solve.chat_timestamp,
             )
-            if not message:
-                continue
-        except Exception as e:
-            logger.error(f"Error solving instance id {instance_to_solve.instance['id']}: {e}")
-        else:
-            try:
-                _send_message(
-                    instance_to_solve.instance["id"],
-                    message,
-                    SETTINGS,
-                )
-            except Exception as e:
-                logger.error(
-                    f"Error sending message for instance id {instance_to_solve.instance['id']}: {e}"
-                )
+            continue
+        if instance_to_solve.waiting_since is None:
+            instance_to_solve.waiting_since = awarded_at[instance_to_solve.instance["id"]]
+
+        solve_pool.submit(
+            instance_to_solve.instance["id"],
+            _solve_and_report,
+            instance_to_solve,
+            SETTINGS,
+            priority=_schedule_priority(instance_to_solve, SETTINGS),
+        )
+
+    solve_pool.log_status()
+    logger.info(f"LLM cache: {cache_stats()}")
+
+
+async def _solve_instances_and_close() -> None:
+    try:
+        await async_solve_instances_handler()
+    finally:
+        await market_api.aclose_async_client()
+
+
+def solve_instances_handler() -> None:
+    asyncio.run(_solve_instances_and_close())
@@ -7,7 +7,12 @@ import time
 from loguru import logger
 
 from src.config import SETTINGS
-from src.solve_instances import solve_instances_handler
+from src.containers import start_orphan_sweeper
+from src.solve_instances import (
+    async_solve_instances_handler,
+    prepare_agent_runtime,
+    shutdown_solve_workers,
+)
 from src.utils.git import accept_repo_invitations
 
 
@@ -21,13 +26,15 @@ async def main():
     Fixes #26: Decoupled from market_scan to allow independent operation.
     """
     logger.info("Starting solve instances process...")
+    start_orphan_sweeper()
+    prepare_agent_runtime()
 
     try:
         counter = 0
         while True:
             try:
                 logger.info("Starting solve instances")
-                solve_instances_handler()
+                await async_solve_instances_handler()
                 logger.info("Solve instances completed successfully")
                 if counter == 1:
                     logger.info("Accepting invitations to private repos")
@@ -39,6 +46,7 @@ async def main():
             counter = (counter + 1) % 10
     except KeyboardInterrupt:
         logger.info("Solve instances process stopped by user")
+        shutdown_solve_workers()
     except Exception as e:
         logger.exception("Fatal error in solve instances process: %s", str(e))
         sys.exit(1)
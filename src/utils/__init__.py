@@ -4,7 +4,11 @@ from .agent_market import (
     get_pr_title,
     remove_all_urls,
 )
-from .file_utils import change_directory_ownership_recursive, copy_file_to_directory
+from .file_utils import (
+    change_directory_ownership_recursive,
+    copy_file_to_directory,
+    normalize_ownership,
+)
 from .git import (
     add_and_commit,
     add_logs_as_pr_comments,
@@ -12,6 +16,7 @@ from .git import (
     clone_repository,
     create_and_push_branch,
     create_pull_request,
+    extract_path_hints,
     extract_repo_name_from_url,
     find_github_repo_url,
     fork_repo,
@@ -23,6 +28,7 @@ from .git import (
 
 __all__ = [
     "find_github_repo_url",
+    "extract_path_hints",
     "clone_repository",
     "fork_repo",
     "push_commits",
@@ -35,6 +41,7 @@ __all__ = [
     "create_and_push_branch",
     "copy_file_to_directory",
     "change_directory_ownership_recursive",
+    "normalize_ownership",
     "get_last_pr_comments",
     "build_solver_command",
     "get_pr_url",
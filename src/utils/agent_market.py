@@ -5,12 +5,14 @@ import openai
 
 from src.config import SETTINGS
 
+from .llm_cache import cached_completion
+
 openai.api_key = SETTINGS.openai_api_key
 WEAK_MODEL = "gpt-4o-mini"
 
 
 def get_pr_title(background: str) -> str:
-    response = openai.chat.completions.create(
+    return cached_completion(
         model=WEAK_MODEL,
         messages=[
             {
@@ -28,15 +30,15 @@ def get_pr_title(background: str) -> str:
                 ),
             },
         ],
+        bypass=not SETTINGS.llm_cache_requester_replies,
     )
-    return response.choices[0].message.content.strip()
 
 
 def get_pr_body(background: str, logs: str) -> str:
     match = re.search(r"Issue Number: (\d+)", background)
     issue_number = match.group(1) if match else None
 
-    response = openai.chat.completions.create(
+    body = cached_completion(
         model=WEAK_MODEL,
         messages=[
             {
@@ -56,8 +58,8 @@ def get_pr_body(background: str, logs: str) -> str:
                 ),
             },
         ],
+        bypass=not SETTINGS.llm_cache_requester_replies,
     )
-    body = response.choices[0].message.content.strip()
 
     if issue_number is not None and f"fixes #{issue_number}" not in body.lower():
         body = f"{body}\n\nFixes #{issue_number}"
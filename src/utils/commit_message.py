@@ -6,6 +6,8 @@ from loguru import logger
 
 from src.config import SETTINGS
 
+from .llm_cache import cached_completion
+
 
 def generate_commit_message(repo_path: str) -> Optional[str]:
     """Generate an informative commit message using AI based on the staged changes.
@@ -18,8 +20,6 @@ def generate_commit_message(repo_path: str) -> Optional[str]:
     """
     try:
         repo = git.Repo(repo_path)
-        if not repo.is_dirty(untracked_files=True):
-            return None
 
         # Get the diff of staged changes
         diff = repo.git.diff("--cached")
@@ -48,12 +48,11 @@ Format the message like this:
             api_key=SETTINGS.litellm_api_key, base_url=SETTINGS.litellm_local_api_base
         )
 
-        response = client.chat.completions.create(
+        commit_message = cached_completion(
             model=SETTINGS.foundation_model_name.value,
             messages=[{"role": "user", "content": prompt}],
+            create=client.chat.completions.create,
         )
-
-        commit_message = response.choices[0].message.content.strip()
         logger.info(f"Generated commit message:\n{commit_message}")
         return commit_message
 
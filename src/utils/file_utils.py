@@ -1,8 +1,9 @@
 import os
 import shutil
 import subprocess
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Union
+from typing import Optional, Union
 
 from loguru import logger
 
@@ -23,3 +24,59 @@ def change_directory_ownership_recursive(
 ) -> None:
     subprocess.run(["chown", "-R", f"{user}:{group}", str(directory)], check=True)
     logger.info(f"Changed ownership of {directory} to {user}:{group}")
+
+
+def _fix_entry(name: str, dir_fd: Optional[int], uid: int, gid: int) -> bool:
+    try:
+        st = os.stat(name, dir_fd=dir_fd, follow_symlinks=False)
+        if st.st_uid == uid and st.st_gid == gid:
+            return False
+        os.chown(name, uid, gid, dir_fd=dir_fd, follow_symlinks=False)
+        return True
+    except FileNotFoundError:
+        return False
+
+
+def _normalize_subtree(directory: str, uid: int, gid: int) -> int:
+    changed = 0
+    for _, dirs, files, root_fd in os.fwalk(directory):
+        for name in dirs + files:
+            changed += _fix_entry(name, root_fd, uid, gid)
+    return changed
+
+
+def _split_subtrees(directory: str, uid: int, gid: int, target: int) -> tuple[list[str], int]:
+    """Fix the top levels of ``directory`` until there are ``target`` subtrees left to walk."""
+    changed = _fix_entry(directory, None, uid, gid)
+    subtrees = [directory]
+    for _ in range(3):
+        if len(subtrees) >= target:
+            break
+        next_level = []
+        for subtree in subtrees:
+            with os.scandir(subtree) as entries:
+                for entry in entries:
+                    changed += _fix_entry(entry.path, None, uid, gid)
+                    if entry.is_dir(follow_symlinks=False):
+                        next_level.append(entry.path)
+        subtrees = next_level
+    return subtrees, changed
+
+
+def normalize_ownership(
+    directory: Union[Path, str], uid: int, gid: int, workers: Optional[int] = None
+) -> int:
+    """Give ``directory`` and everything below it to ``uid``:``gid``, like ``chown -R``.
+
+    Entries that already have the right owner are only stat'ed, through file descriptors
+    relative to their directory, and subtrees are walked in parallel. Symlinks are changed
+    themselves and never followed. Returns the number of entries changed.
+    """
+    workers = workers or min(32, (os.cpu_count() or 1) * 4)
+    subtrees, changed = _split_subtrees(str(directory), uid, gid, workers * 4)
+    with ThreadPoolExecutor(max_workers=workers, thread_name_prefix="chown") as executor:
+        changed += sum(
+            executor.map(lambda subtree: _normalize_subtree(subtree, uid, gid), subtrees)
+        )
+    logger.info(f"Normalized ownership of {directory} to {uid}:{gid}, {changed} entries changed")
+    return changed
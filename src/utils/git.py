@@ -1,16 +1,39 @@
+import fnmatch
+import functools
 import os
 import re
 import shutil
+import subprocess
+import threading
 import time
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from datetime import datetime
 from typing import Optional
 
 import git
 import github
 import httpx
 import tenacity
+from github.Issue import Issue
+from github.PullRequest import PullRequest
 from loguru import logger
 
+from src.config import SETTINGS
+from src.enums import CloneStrategy, RequestPriority
+
 from .commit_message import generate_commit_message
+from .git_mirror import clone_from_mirror
+from .github_client import get_branch, get_github, get_repo, get_user_login
+from .github_rate_limit import acquire, rate_limited, record_from_headers
+from .pr_context import PrComment, PrFile, build_pr_context
+
+_MAX_PATH_HINTS = 20
+
+_fork_syncs: dict[tuple[str, str], float] = {}
+_fork_syncs_lock = threading.Lock()
+_repo_sizes: dict[str, int] = {}
+_repo_sizes_lock = threading.Lock()
 
 
 def find_github_repo_url(text: str) -> Optional[str]:
@@ -21,100 +44,243 @@ def find_github_repo_url(text: str) -> Optional[str]:
     return None
 
 
-def clone_repository(repo_url: str, target_dir: str, github_token: str = None) -> None:
-    if os.path.exists(target_dir):
-        shutil.rmtree(target_dir)
+def extract_path_hints(text: str) -> list[str]:
+    """Directories of the repository paths mentioned in ``text``, such as ``src/utils/git.py``."""
+    text = re.sub(r"https?://\S+", " ", text)
+    hints = []
+    for path in re.findall(r"(?<![\w/.-])(?:\.?/)?((?:[\w.-]+/)+[\w.-]*)", text):
+        is_file = "." in path.rsplit("/", 1)[-1]
+        directory = os.path.dirname(path) if is_file else path.rstrip("/")
+        if directory and ".." not in directory.split("/") and directory not in hints:
+            hints.append(directory)
+    return hints[:_MAX_PATH_HINTS]
+
+
+def _empty_directory(directory: str) -> None:
+    """Create ``directory`` or remove its contents, keeping the directory itself.
+
+    The directory may already be bind-mounted into a warm agent container, so it must not be
+    replaced.
+    """
+    os.makedirs(directory, exist_ok=True)
+    for entry in os.scandir(directory):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path)
+        else:
+            os.remove(entry.path)
+
 
-    os.makedirs(target_dir)
+def _repo_size_kb(repo_url: str, github_token: str) -> Optional[int]:
+    """The size GitHub reports for ``repo_url``, or None when the budget has none to spare.
+
+    Sizes are cached for the life of the process and the lookup never waits for the budget,
+    since it only picks a clone strategy on the solve path.
+    """
+    repo_path = repo_url.split("github.com/")[-1].removesuffix(".git")
+    with _repo_sizes_lock:
+        size_kb = _repo_sizes.get(repo_path)
+    if size_kb is not None:
+        return size_kb
+
+    if not acquire(github_token, RequestPriority.low, block=False):
+        return None
+    size_kb = get_repo(github_token, repo_path).size
+    with _repo_sizes_lock:
+        _repo_sizes[repo_path] = size_kb
+    return size_kb
+
+
+def _clone_strategy(repo_url: str, github_token: Optional[str]) -> CloneStrategy:
+    """The configured clone strategy, chosen from the size GitHub reports when it is auto."""
+    if SETTINGS.clone_strategy != CloneStrategy.auto:
+        return SETTINGS.clone_strategy
+    if not github_token or "github.com/" not in repo_url:
+        return CloneStrategy.full
+
+    try:
+        size_kb = _repo_size_kb(repo_url, github_token)
+    except Exception as e:
+        logger.warning(f"Failed to get the size of {repo_url}, cloning it in full: {e}")
+        return CloneStrategy.full
+    if size_kb is None:
+        logger.info(f"No GitHub budget to look up the size of {repo_url}, cloning it in full")
+        return CloneStrategy.full
+
+    if size_kb >= SETTINGS.clone_treeless_min_kb:
+        return CloneStrategy.treeless
+    if size_kb >= SETTINGS.clone_blobless_min_kb:
+        return CloneStrategy.blobless
+    return CloneStrategy.full
+
+
+def _clone_options(strategy: CloneStrategy) -> list[str]:
+    if strategy == CloneStrategy.shallow:
+        # Keep every branch so an existing instance branch can still be checked out.
+        return [f"--depth={SETTINGS.clone_depth}", "--no-single-branch"]
+    if strategy == CloneStrategy.blobless:
+        return ["--filter=blob:none"]
+    if strategy == CloneStrategy.treeless:
+        return ["--filter=tree:0"]
+    return []
+
+
+def clone_repository(
+    repo_url: str,
+    target_dir: str,
+    github_token: str = None,
+    path_hints: Optional[list[str]] = None,
+) -> None:
+    """Clone ``repo_url`` into ``target_dir`` with the configured clone strategy.
+
+    Full clones go through the mirror cache. Shallow and partial clones are made directly,
+    without LFS content, and when ``clone_sparse_checkout`` is enabled they check out only the
+    root files and the directories in ``path_hints``; other blobs are fetched on demand.
+    """
+    _empty_directory(target_dir)
 
     if github_token and repo_url.startswith("https://"):
         auth_url = f"https://{github_token}@github.com/{repo_url.split('github.com/')[-1]}"
     else:
         auth_url = repo_url
 
+    strategy = _clone_strategy(repo_url, github_token)
+    if strategy != CloneStrategy.full:
+        options = _clone_options(strategy)
+        sparse_paths = path_hints if SETTINGS.clone_sparse_checkout else None
+        if sparse_paths:
+            options.append("--sparse")
+        repo = git.Repo.clone_from(
+            auth_url, target_dir, multi_options=options, env={"GIT_LFS_SKIP_SMUDGE": "1"}
+        )
+        if sparse_paths:
+            repo.git.sparse_checkout("add", *sparse_paths)
+        logger.info(
+            f"Cloned repository from {repo_url} to {target_dir} ({strategy.value} clone"
+            f"{', sparse: ' + ' '.join(sparse_paths) if sparse_paths else ''})"
+        )
+        return
+
+    if SETTINGS.git_mirror_cache_enabled:
+        try:
+            clone_from_mirror(repo_url, auth_url, target_dir)
+            return
+        except Exception as e:
+            logger.warning(f"Mirror clone of {repo_url} failed, cloning directly: {e}")
+            _empty_directory(target_dir)
+
     git.Repo.clone_from(auth_url, target_dir)
     logger.info(f"Cloned repository from {repo_url} to {target_dir}")
 
 
+@rate_limited()
 def fork_repo(github_url: str, github_token: str) -> str:
-    g = github.Github(github_token)
     repo_path = github_url.replace("https://github.com/", "").removesuffix(".git")
-    repo = g.get_repo(repo_path)
-    user = g.get_user()
+    repo = get_repo(github_token, repo_path)
+    user = get_github(github_token).get_user()
     forked_repo = user.create_fork(repo)
     logger.info("Forked repo: {}", forked_repo.clone_url)
     return forked_repo.clone_url
 
 
+@dataclass
+class WorkingTreeChanges:
+    """Unstaged changes of a working tree, by kind, as paths relative to its root."""
+
+    added: list[str] = field(default_factory=list)
+    modified: list[str] = field(default_factory=list)
+    deleted: list[str] = field(default_factory=list)
+    renamed: list[tuple[str, str]] = field(default_factory=list)
+
+    def paths(self) -> list[str]:
+        return self.added + self.modified + self.deleted
+
+
+@functools.lru_cache(maxsize=None)
+def _ignore_matcher(patterns: tuple[str, ...]) -> re.Pattern:
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns) or "(?!)")
+
+
+def working_tree_changes(repo_path: str) -> WorkingTreeChanges:
+    """Classify the unstaged changes of ``repo_path`` from one ``git status --porcelain=v2``.
+
+    Paths matching ``commit_ignore_patterns`` are left out.
+    """
+    ignored = _ignore_matcher(tuple(SETTINGS.commit_ignore_patterns))
+    output = subprocess.run(
+        ["git", "status", "--porcelain=v2", "-z", "--untracked-files=all"],
+        cwd=repo_path,
+        capture_output=True,
+        check=True,
+    ).stdout.decode("utf-8", "surrogateescape")
+
+    changes = WorkingTreeChanges()
+    entries = iter(output.split("\0"))
+    for entry in entries:
+        if not entry:
+            continue
+        kind = entry[0]
+        if kind == "?":
+            path, worktree_status = entry[2:], "A"
+        elif kind == "1":
+            worktree_status, path = entry[3], entry.split(" ", 8)[8]
+        elif kind == "2":
+            # Renames are only detected once staged; their worktree side is still checked.
+            worktree_status, path = entry[3], entry.split(" ", 9)[9]
+            changes.renamed.append((next(entries), path))
+        elif kind == "u":
+            worktree_status, path = "M", entry.split(" ", 10)[10]
+        else:
+            continue
+
+        if worktree_status == "." or ignored.match(path):
+            continue
+        if worktree_status == "A":
+            changes.added.append(path)
+        elif worktree_status == "D":
+            changes.deleted.append(path)
+        else:
+            changes.modified.append(path)
+    return changes
+
+
 def add_and_commit(repo_path: str) -> None:
     try:
         repo = git.Repo(repo_path)
         logger.info(f"Repository initialized at {repo_path}")
 
-        if repo.is_dirty(untracked_files=True):
-            logger.info("Repository is dirty. Staging changes except aider files.")
-
-            # Get tracked files that have been modified
-            changed_files = []
-            for item in repo.index.diff(None):
-                if item.deleted_file:
-                    # Handle deleted files explicitly
-                    changed_files.append(item.a_path)
-                    repo.index.remove([item.a_path])
-                else:
-                    # Only add existing files
-                    if os.path.exists(os.path.join(repo_path, item.a_path)):
-                        changed_files.append(item.a_path)
-                    else:
-                        logger.warning(f"Skipping non-existent tracked file: {item.a_path}")
-
-            # Get untracked files that exist
-            untracked_files = []
-            for f in repo.untracked_files:
-                if os.path.exists(os.path.join(repo_path, f)):
-                    untracked_files.append(f)
-                else:
-                    logger.warning(f"Skipping non-existent untracked file: {f}")
-
-            all_files = changed_files + untracked_files
-
-            files_to_stage = [
-                f
-                for f in all_files
-                if not f.startswith(".aider") and not f.endswith("aider_modify_repo.py")
-            ]
+        changes = working_tree_changes(repo_path)
+        files_to_stage = changes.paths()
+        if not files_to_stage:
+            logger.info("No non-aider changes detected. Nothing to commit.")
+            return
 
-            if files_to_stage:
-                # Stage files that definitely exist
-                files_to_add = []
-                for f in files_to_stage:
-                    file_path = os.path.join(repo_path, f)
-                    if os.path.exists(file_path):
-                        files_to_add.append(f)
-                    else:
-                        logger.warning(f"Skipping non-existent file during staging: {f}")
-
-                if files_to_add:
-                    repo.index.add(files_to_add)
-                logger.info("Changes staged successfully (excluding aider files).")
-
-                commit_message = generate_commit_message(repo_path)
-                if commit_message is None:
-                    commit_message = "agent bot commit"
-
-                repo.index.commit(commit_message)
-                logger.info(f"Changes committed with message: '{commit_message}'")
-            else:
-                logger.info("No non-aider files to stage. Skipping commit.")
-        else:
-            logger.info("No unstaged changes detected. Nothing to commit.")
+        logger.info(
+            f"Staging {len(changes.added)} added, {len(changes.modified)} modified and "
+            f"{len(changes.deleted)} deleted files, excluding aider files."
+        )
+        # One update-index call stages additions, modifications and deletions alike, and does
+        # not change the process working directory the way IndexFile.add does.
+        subprocess.run(
+            ["git", "update-index", "--add", "--remove", "-z", "--stdin"],
+            cwd=repo_path,
+            input="\0".join(files_to_stage).encode("utf-8", "surrogateescape") + b"\0",
+            capture_output=True,
+            check=True,
+        )
+        logger.info("Changes staged successfully (excluding aider files).")
+
+        commit_message = generate_commit_message(repo_path)
+        if commit_message is None:
+            commit_message = "agent bot commit"
+
+        repo.index.commit(commit_message)
+        logger.info(f"Changes committed with message: '{commit_message}'")
 
     except Exception as e:
         logger.error(f"An error occurred: {e}")
         raise
 
 
-
 def push_commits(repo_path: str, github_token: str) -> bool:
     try:
         repo = git.Repo(repo_path)
@@ -149,6 +315,7 @@ def push_commits(repo_path: str, github_token: str) -> bool:
         raise
 
 
+@rate_limited()
 def create_pull_request(
     source_repo_name: str,
     target_repo_name: str,
@@ -160,7 +327,6 @@ def create_pull_request(
 ) -> str:
     try:
         repo = git.Repo(source_repo_path)
-        g = github.Github(github_token)
 
         source_repo_name = source_repo_name.removesuffix(".git")
         target_repo_name = target_repo_name.removesuffix(".git")
@@ -168,23 +334,23 @@ def create_pull_request(
         logger.info(f"Attempting to create PR from {source_repo_name} to {target_repo_name}")
 
         try:
-            target_repo = g.get_repo(target_repo_name)
+            target_repo = get_repo(github_token, target_repo_name)
         except github.UnknownObjectException:
             logger.error(f"Target repository not found: {target_repo_name}")
             raise ValueError(f"Target repository not found: {target_repo_name}")
 
         try:
-            source_repo = g.get_repo(source_repo_name)
+            source_repo = get_repo(github_token, source_repo_name)
         except github.UnknownObjectException:
             logger.error(f"Source repository not found: {source_repo_name}")
             raise ValueError(f"Source repository not found: {source_repo_name}")
 
         try:
-            target_repo.get_branch(base_branch)
+            get_branch(github_token, target_repo_name, base_branch)
         except github.GithubException:
             logger.warning(f"Base branch '{base_branch}' not found, trying 'master'")
             try:
-                target_repo.get_branch("master")
+                get_branch(github_token, target_repo_name, "master")
                 base_branch = "master"
             except github.GithubException:
                 logger.error("Neither 'main' nor 'master' branch found in target repo")
@@ -284,7 +450,70 @@ def set_git_config(username: str, email: str, repo_dir: str):
         raise
 
 
+def _merge_upstream_locally(
+    repo: git.Repo,
+    parent_repo: github.Repository.Repository,
+    default_branch: str,
+    github_token: str,
+    origin_url: str,
+    repo_path_str: str,
+) -> None:
+    upstream_url = parent_repo.clone_url.rstrip("/")
+    logger.debug(f"Original upstream URL: {upstream_url}")
+
+    # Format upstream URL with token
+    if upstream_url.startswith("https://"):
+        upstream_url = f"https://{github_token}@github.com/{parent_repo.full_name}.git"
+        logger.debug("Formatted upstream URL with token")
+
+    try:
+        upstream = repo.remote("upstream")
+        if upstream.url != upstream_url:
+            logger.info("Updating existing upstream remote URL")
+            upstream.set_url(upstream_url)
+    except ValueError:
+        logger.info("Creating new upstream remote")
+        upstream = repo.create_remote("upstream", upstream_url)
+
+    logger.info(f"Fetching {default_branch} from upstream...")
+    upstream.fetch(default_branch)
+    logger.info("Successfully fetched latest changes from upstream repository")
+
+    logger.info(f"Checking out {default_branch} branch")
+    repo.git.checkout(default_branch)
+
+    logger.info(f"Merging upstream/{default_branch}")
+    repo.git.merge(f"upstream/{default_branch}")
+    logger.info(f"Successfully merged upstream/{default_branch} into local {default_branch}")
+
+    # Format origin URL with token
+    if origin_url.startswith("https://"):
+        new_origin_url = f"https://{github_token}@github.com/{repo_path_str}.git"
+        logger.debug("Updating origin URL with token")
+        repo.remotes.origin.set_url(new_origin_url)
+
+    logger.info(f"Pushing to origin/{default_branch}")
+    repo.remotes.origin.push(default_branch)
+    logger.info(f"Successfully pushed synced {default_branch} to origin")
+
+
+def _fast_forward_default_branch(repo: git.Repo, default_branch: str) -> None:
+    """Move the local default branch to the fork's, after GitHub synced it server side."""
+    repo.remotes.origin.fetch(default_branch)
+    repo.git.checkout(default_branch)
+    repo.git.merge("--ff-only", f"origin/{default_branch}")
+    logger.info(f"Fast-forwarded local {default_branch} to origin/{default_branch}")
+
+
+@rate_limited()
 def sync_fork_with_upstream(repo_path: str, github_token: str) -> None:
+    """Bring the default branch of the fork cloned at ``repo_path`` up to date with upstream.
+
+    Nothing is done when the fork was synced in the last ``fork_sync_ttl`` seconds or when its
+    default branch already points at the upstream commit. Otherwise GitHub merges upstream into
+    the fork and the local branch is fast-forwarded; fetching, merging and pushing locally is
+    only a fallback for when GitHub cannot merge, e.g. on conflicts.
+    """
     try:
         logger.info(f"Starting fork sync for repository at {repo_path}")
         repo = git.Repo(repo_path)
@@ -305,10 +534,15 @@ def sync_fork_with_upstream(repo_path: str, github_token: str) -> None:
 
         logger.info(f"Extracted repository path: {repo_path_str}")
 
+        sync_key = (github_token, repo_path_str)
+        with _fork_syncs_lock:
+            synced_at = _fork_syncs.get(sync_key)
+        if synced_at is not None and time.monotonic() - synced_at < SETTINGS.fork_sync_ttl:
+            logger.info(f"Fork {repo_path_str} was synced recently, skipping")
+            return
+
         # Connect to GitHub API
-        g = github.Github(github_token)
-        logger.debug("Connected to GitHub API")
-        fork_repo = g.get_repo(repo_path_str)
+        fork_repo = get_repo(github_token, repo_path_str)
         logger.info(f"Found fork repository: {fork_repo.full_name}")
 
         # Get the parent (upstream) repository
@@ -318,49 +552,28 @@ def sync_fork_with_upstream(repo_path: str, github_token: str) -> None:
             return
 
         logger.info(f"Found parent repository: {parent_repo.full_name}")
-        upstream_url = parent_repo.clone_url.rstrip("/")
-        logger.debug(f"Original upstream URL: {upstream_url}")
-
-        # Format upstream URL with token
-        if upstream_url.startswith("https://"):
-            upstream_url = f"https://{github_token}@github.com/{parent_repo.full_name}.git"
-            logger.debug("Formatted upstream URL with token")
-
-        try:
-            upstream = repo.remote("upstream")
-            if upstream.url != upstream_url:
-                logger.info("Updating existing upstream remote URL")
-                upstream.set_url(upstream_url)
-        except ValueError:
-            logger.info("Creating new upstream remote")
-            upstream = repo.create_remote("upstream", upstream_url)
-
-        # Fetch from upstream
-        logger.info("Fetching from upstream...")
-        upstream.fetch()
-        logger.info("Successfully fetched latest changes from upstream repository")
-
-        # Get default branch
         default_branch = parent_repo.default_branch
         logger.info(f"Using default branch: {default_branch}")
 
-        # Sync fork with upstream
-        logger.info(f"Checking out {default_branch} branch")
-        repo.git.checkout(default_branch)
-
-        logger.info(f"Merging upstream/{default_branch}")
-        repo.git.merge(f"upstream/{default_branch}")
-        logger.info(f"Successfully merged upstream/{default_branch} into local {default_branch}")
-
-        # Format origin URL with token
-        if origin_url.startswith("https://"):
-            new_origin_url = f"https://{github_token}@github.com/{repo_path_str}.git"
-            logger.debug("Updating origin URL with token")
-            repo.remotes.origin.set_url(new_origin_url)
-
-        logger.info(f"Pushing to origin/{default_branch}")
-        repo.remotes.origin.push(default_branch)
-        logger.info(f"Successfully pushed synced {default_branch} to origin")
+        upstream_sha = parent_repo.get_branch(default_branch).commit.sha
+        fork_sha = fork_repo.get_branch(default_branch).commit.sha
+        if fork_sha == upstream_sha:
+            logger.info(f"Fork {default_branch} is up to date with upstream at {fork_sha[:12]}")
+        else:
+            try:
+                merged = fork_repo.merge_upstream(default_branch)
+                logger.info(f"GitHub synced fork {default_branch}: {merged.message}")
+                _fast_forward_default_branch(repo, default_branch)
+            except github.GithubException as e:
+                logger.warning(
+                    f"GitHub could not sync fork {default_branch} ({e.status}), merging locally"
+                )
+                _merge_upstream_locally(
+                    repo, parent_repo, default_branch, github_token, origin_url, repo_path_str
+                )
+
+        with _fork_syncs_lock:
+            _fork_syncs[sync_key] = time.monotonic()
 
     except github.GithubException as e:
         logger.error(f"GitHub API error: {e.status} - {e.data.get('message', '')}")
@@ -373,9 +586,14 @@ def sync_fork_with_upstream(repo_path: str, github_token: str) -> None:
         raise
 
 
+@rate_limited()
 def create_and_push_branch(repo_path: str, branch_name: str, github_token: str) -> None:
     """Create and push a new branch, ensuring the fork is synced with upstream first.
 
+    Whether the branch exists on the fork is read from the remote-tracking refs the clone
+    already fetched, so the only network operations are the fork sync and, for a new branch,
+    the push.
+
     Args:
         repo_path: Path to the local repository
         branch_name: Name of the branch to create
@@ -386,8 +604,7 @@ def create_and_push_branch(repo_path: str, branch_name: str, github_token: str)
         sync_fork_with_upstream(repo_path, github_token)
 
         repo = git.Repo(repo_path)
-        repo.remotes.origin.fetch()
-        logger.info(f"Repository initialized and fetched at {repo_path}")
+        logger.info(f"Repository initialized at {repo_path}")
 
         if repo.bare:
             logger.error("The repository is bare. Cannot perform operations.")
@@ -395,126 +612,132 @@ def create_and_push_branch(repo_path: str, branch_name: str, github_token: str)
 
         local_branches = [head.name for head in repo.heads]
         logger.info(f"Local heads are: {local_branches}")
-        remote_branches = [ref.name.split("/")[-1] for ref in repo.remotes.origin.refs if "heads"]
+        remote_branches = [
+            ref.remote_head for ref in repo.remotes.origin.refs if ref.remote_head != "HEAD"
+        ]
         logger.info(f"Remote branches are: {remote_branches}")
 
         branch_in_remote = branch_name in remote_branches
 
         if branch_name in local_branches:
             logger.info(f"Branch '{branch_name}' already exists locally.")
+            repo.heads[branch_name].checkout()
+            if branch_in_remote:
+                logger.info(f"Merging origin/{branch_name} into the local branch")
+                repo.git.merge(f"origin/{branch_name}")
         elif branch_in_remote:
             logger.info(f"Branch '{branch_name}' exists remotely. Checking it out locally.")
             repo.git.checkout(f"origin/{branch_name}", b=branch_name)
         else:
             logger.info(f"Branch '{branch_name}' does not exist. Creating locally.")
-            repo.create_head(branch_name)
-
-        repo.heads[branch_name].checkout()
+            repo.create_head(branch_name).checkout()
         logger.info(f"Checked out to branch '{branch_name}'.")
 
         if branch_in_remote:
-            logger.info(f"Pulling latest changes from origin/{branch_name}")
-            repo.remotes.origin.pull(branch_name)
+            logger.warning(f"Branch '{branch_name}' already exists on the remote.")
         else:
-            logger.info(f"No remote branch '{branch_name}' to pull from.")
+            repo.remotes.origin.push(refspec=f"{branch_name}:{branch_name}", set_upstream=True)
+            logger.info(f"Branch '{branch_name}' pushed to remote and set upstream.")
 
-        g = github.Github(github_token)
-        logger.info("Authenticated with GitHub using the provided token.")
+    except Exception as e:
+        logger.error(f"Error: {e}")
 
-        origin = repo.remote(name="origin")
-        remote_url = origin.url
-        logger.info(f"Remote URL: {remote_url}")
 
-        if remote_url.startswith("https://"):
-            repo_path = remote_url.split("github.com/")[-1].removesuffix(".git")
-        elif remote_url.startswith("git@"):
-            repo_path = remote_url.split(":")[-1].removesuffix(".git")
-        else:
-            logger.error("Unrecognized remote URL format.")
-            raise Exception("Invalid remote URL format.")
+@dataclass
+class _PrThread:
+    """The comments of a PR seen so far, refreshed with ``since`` from ``watermark``."""
 
-        github_repo = g.get_repo(repo_path)
-        logger.info(f"Connected to GitHub repository: {github_repo.full_name}")
+    pull: PullRequest
+    issue: Issue
+    comments: dict[tuple[str, int], PrComment] = field(default_factory=dict)
+    watermark: Optional[datetime] = None
 
-        remote_branches = [ref.ref.replace("refs/heads/", "") for ref in github_repo.get_git_refs()]
-        logger.info(f"Remote branches fetched: {remote_branches}")
 
-        if branch_name in remote_branches:
-            logger.warning(f"Branch '{branch_name}' already exists on the remote.")
-        else:
-            origin.push(refspec=f"{branch_name}:{branch_name}", set_upstream=True)
-            logger.info(f"Branch '{branch_name}' pushed to remote and set upstream.")
-
-    except Exception as e:
-        logger.error(f"Error: {e}")
+_PR_THREADS_MAX = 256
+_pr_threads: OrderedDict[str, _PrThread] = OrderedDict()
+_pr_threads_lock = threading.Lock()
 
 
-def get_last_pr_comments(pr_url: str, github_token: str) -> str | bool:
-    g = github.Github(github_token)
+def _pr_thread(pr_url: str, github_token: str) -> _PrThread:
+    with _pr_threads_lock:
+        thread = _pr_threads.get(pr_url)
+        if thread is not None:
+            _pr_threads.move_to_end(pr_url)
+            return thread
 
     pr_path = pr_url.split("github.com/")[-1]
     owner_repo, pr_number = pr_path.split("/pull/")
-    pr_number = int(pr_number)
+    repo = get_repo(github_token, owner_repo)
+    thread = _PrThread(pull=repo.get_pull(int(pr_number)), issue=repo.get_issue(int(pr_number)))
 
-    repo = g.get_repo(owner_repo)
-    pr = repo.get_pull(pr_number)
+    with _pr_threads_lock:
+        _pr_threads[pr_url] = thread
+        while len(_pr_threads) > _PR_THREADS_MAX:
+            _pr_threads.popitem(last=False)
+    return thread
 
-    issue_comments = list(pr.get_issue_comments())
-    review_comments = list(pr.get_review_comments())
 
-    last_issue_comment = issue_comments[-1] if issue_comments else None
-    last_review_comment = review_comments[-1] if review_comments else None
+def _fetch_new_pr_comments(thread: _PrThread) -> int:
+    """Merge the comments created or edited since the watermark into ``thread``.
 
-    last_comment = None
-    if last_issue_comment and last_review_comment:
-        last_comment = (
-            last_issue_comment
-            if last_issue_comment.created_at > last_review_comment.created_at
-            else last_review_comment
+    GitHub filters ``since`` on the update time, inclusively, so the comments at the watermark
+    come back again and are merged by id. Returns the number of comments received.
+    """
+    since = thread.watermark if thread.watermark is not None else github.GithubObject.NotSet
+    received = 0
+    for comment in thread.issue.get_comments(since=since):
+        text = f"Comment by {comment.user.login} at {comment.created_at}:\n{comment.body}"
+        thread.comments[("issue", comment.id)] = PrComment(
+            comment.created_at, comment.user.login, text
         )
-    elif last_issue_comment:
-        last_comment = last_issue_comment
-    elif last_review_comment:
-        last_comment = last_review_comment
-    else:
-        return False  # No comments found
+        thread.watermark = max(filter(None, [thread.watermark, comment.updated_at]))
+        received += 1
+
+    for comment in thread.pull.get_review_comments(since=since):
+        text = "\n".join(
+            [
+                f"Review comment by {comment.user.login} at {comment.created_at}:",
+                f"File: {comment.path}, Line: {comment.line}",
+                comment.body,
+            ]
+        )
+        thread.comments[("review", comment.id)] = PrComment(
+            comment.created_at, comment.user.login, text, path=comment.path
+        )
+        thread.watermark = max(filter(None, [thread.watermark, comment.updated_at]))
+        received += 1
+    return received
 
-    if last_comment.user.login == g.get_user().login:
-        return False
 
-    diff_content = pr.get_files()
-    diff_text = []
-    for file in diff_content:
-        diff_text.append(f"File: {file.filename}")
-        diff_text.append(f"Status: {file.status}")
-        diff_text.append(f"Changes: +{file.additions} -{file.deletions}")
-        diff_text.append(f"Patch:\n{file.patch if file.patch else 'No patch available'}\n")
-
-    comments = []
-
-    issue_comments = pr.get_issue_comments()
-    for comment in issue_comments:
-        comments.append(f"Comment by {comment.user.login} at {comment.created_at}:")
-        comments.append(comment.body)
-        comments.append("---")
-
-    review_comments = pr.get_review_comments()
-    for comment in review_comments:
-        comments.append(f"Review comment by {comment.user.login} at {comment.created_at}:")
-        comments.append(f"File: {comment.path}, Line: {comment.line}")
-        comments.append(comment.body)
-        comments.append("---")
+@rate_limited(RequestPriority.low, block=False)
+def get_last_pr_comments(pr_url: str, github_token: str) -> str | bool | None:
+    """Return the diff and comments of the PR if its newest comment is not ours, else False.
 
-    result = "\n".join(
-        [
-            "DIFF",
-            "\n".join(diff_text),
-            "COMMENTS",
-            "\n".join(comments),
-        ]
-    )
+    None is returned without a request when the GitHub budget has nothing to spare.
 
-    return result
+    The comments are kept per PR and only those changed since the last call are listed, so an
+    idle PR costs one request per comment kind. The diff is loaded only when it is returned.
+    Comments deleted after they were seen are kept. The text is cut to the PR context budget.
+    """
+    thread = _pr_thread(pr_url, github_token)
+    received = _fetch_new_pr_comments(thread)
+    logger.debug(f"Received {received} new or edited comments on {pr_url}")
+
+    if not thread.comments:
+        return False  # No comments found
+
+    last_comment = max(thread.comments.values(), key=lambda comment: comment.created_at)
+    if last_comment.author == get_user_login(github_token):
+        return False
+
+    files = [
+        PrFile(file.filename, file.status, file.additions, file.deletions, file.patch)
+        for file in thread.pull.get_files()
+    ]
+    issue_comments, review_comments = [], []
+    for (kind, _), comment in sorted(thread.comments.items()):
+        (issue_comments if kind == "issue" else review_comments).append(comment)
+    return build_pr_context(files, issue_comments, review_comments)
 
 
 def build_solver_command(
@@ -674,14 +897,13 @@ def _build_solver_command_from_chat(background: str, user_messages: str) -> str:
     return result
 
 
+@rate_limited()
 def add_logs_as_pr_comments(pr_url: str, github_token: str, logs: str) -> None:
-    g = github.Github(github_token)
-
     pr_path = pr_url.split("github.com/")[-1]
     owner_repo, pr_number = pr_path.split("/pull/")
     pr_number = int(pr_number)
 
-    repo = g.get_repo(owner_repo)
+    repo = get_repo(github_token, owner_repo)
     pr = repo.get_pull(pr_number)
 
     comment = f"## Aider:\n{logs}\n"
@@ -734,10 +956,15 @@ async def accept_repo_invitations(pat_token):
     api_url = "https://api.github.com"
     headers = {"Authorization": f"token {pat_token}", "Accept": "application/vnd.github.v3+json"}
 
+    if not acquire(pat_token, RequestPriority.low, block=False):
+        logger.info("Postponing repository invitation polling to preserve the GitHub budget")
+        return
+
     async with httpx.AsyncClient(timeout=30.0) as client:
         try:
             invitations_url = f"{api_url}/user/repository_invitations"
             response = await make_github_request(client, "get", invitations_url, headers)
+            record_from_headers(pat_token, response.headers)
             invitations = response.json()
 
             if not invitations:
@@ -749,7 +976,8 @@ async def accept_repo_invitations(pat_token):
                 repo_name = invitation["repository"]["full_name"]
 
                 accept_url = f"{api_url}/user/repository_invitations/{invitation_id}"
-                await make_github_request(client, "patch", accept_url, headers)
+                response = await make_github_request(client, "patch", accept_url, headers)
+                record_from_headers(pat_token, response.headers)
                 logger.info(f"Successfully accepted invitation for repository: {repo_name}")
 
         except tenacity.RetryError as e:
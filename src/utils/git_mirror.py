@@ -0,0 +1,137 @@
+import fcntl
+import os
+import shutil
+import tempfile
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Iterator
+
+import git
+from loguru import logger
+
+from src.config import SETTINGS
+
+_MIRROR_REFSPECS = ["+refs/heads/*:refs/heads/*", "+refs/tags/*:refs/tags/*"]
+
+
+def _mirror_root() -> Path:
+    root = Path(os.path.expanduser(SETTINGS.git_mirror_cache_dir))
+    root.mkdir(parents=True, exist_ok=True)
+    return root
+
+
+def _mirror_path(repo_url: str) -> Path:
+    repo_name = repo_url.rstrip("/").removesuffix(".git").split("github.com")[-1].lstrip("/:")
+    return _mirror_root() / f"{repo_name.replace('/', '__')}.git"
+
+
+@contextmanager
+def _mirror_lock(mirror: Path, exclusive: bool, blocking: bool = True) -> Iterator[bool]:
+    """Hold a lock on ``mirror`` that is shared between threads and processes."""
+    with open(f"{mirror}.lock", "a") as lock_file:
+        flags = fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH
+        if not blocking:
+            flags |= fcntl.LOCK_NB
+        try:
+            fcntl.flock(lock_file, flags)
+        except BlockingIOError:
+            yield False
+            return
+        try:
+            yield True
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def _directory_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                pass
+    return total
+
+
+def _size_path(mirror: Path) -> Path:
+    return mirror.with_name(f"{mirror.name}.size")
+
+
+def _record_size(mirror: Path) -> int:
+    """Measure ``mirror`` and store its size next to it, so eviction does not walk the cache."""
+    size = _directory_size(mirror)
+    with tempfile.NamedTemporaryFile("w", dir=mirror.parent, delete=False) as tmp:
+        tmp.write(str(size))
+    os.replace(tmp.name, _size_path(mirror))
+    return size
+
+
+def _recorded_size(mirror: Path) -> int:
+    try:
+        return int(_size_path(mirror).read_text())
+    except (OSError, ValueError):
+        # Mirrors created before sizes were recorded are measured once.
+        return _record_size(mirror)
+
+
+def _update_mirror(mirror: Path, auth_url: str) -> None:
+    if (mirror / "HEAD").exists():
+        logger.info(f"Fetching updates into mirror {mirror}")
+        git.Repo(mirror).git.fetch(auth_url, "--prune", *_MIRROR_REFSPECS)
+        return
+
+    logger.info(f"Creating mirror {mirror}")
+    staging_dir = tempfile.mkdtemp(prefix=f"{mirror.name}.", dir=mirror.parent)
+    try:
+        mirror_repo = git.Repo.clone_from(auth_url, staging_dir, bare=True)
+        # Fetches always pass the URL explicitly so the token is not persisted in the mirror.
+        mirror_repo.delete_remote(mirror_repo.remote("origin"))
+        os.rename(staging_dir, mirror)
+    except Exception:
+        shutil.rmtree(staging_dir, ignore_errors=True)
+        raise
+
+
+def clone_from_mirror(repo_url: str, auth_url: str, target_dir: str) -> None:
+    """Clone ``repo_url`` into ``target_dir`` through an incrementally updated local mirror.
+
+    The workspace is a regular local clone of the mirror, so objects are hard-linked rather than
+    referenced through alternates and the workspace stays usable inside agent containers.
+    """
+    mirror = _mirror_path(repo_url)
+    with _mirror_lock(mirror, exclusive=True):
+        _update_mirror(mirror, auth_url)
+        _record_size(mirror)
+        os.utime(mirror)
+
+    with _mirror_lock(mirror, exclusive=False):
+        workspace = git.Repo.clone_from(str(mirror), target_dir)
+    workspace.remotes.origin.set_url(auth_url)
+    logger.info(f"Cloned {repo_url} to {target_dir} from mirror {mirror}")
+
+    evict_cold_mirrors(keep=mirror)
+
+
+def evict_cold_mirrors(keep: Path | None = None) -> None:
+    """Remove least recently used mirrors until the cache fits in its size budget.
+
+    Sizes are the ones recorded when each mirror was last updated.
+    """
+    mirrors = [path for path in _mirror_root().glob("*.git") if path.is_dir() and path != keep]
+    sizes = {path: _recorded_size(path) for path in mirrors}
+    total = sum(sizes.values()) + (_recorded_size(keep) if keep else 0)
+    if total <= SETTINGS.git_mirror_cache_max_bytes:
+        return
+
+    for mirror in sorted(mirrors, key=lambda path: path.stat().st_mtime):
+        if total <= SETTINGS.git_mirror_cache_max_bytes:
+            break
+        with _mirror_lock(mirror, exclusive=True, blocking=False) as locked:
+            if not locked:
+                logger.info(f"Mirror {mirror} is in use, not evicting it")
+                continue
+            shutil.rmtree(mirror, ignore_errors=True)
+            _size_path(mirror).unlink(missing_ok=True)
+        total -= sizes[mirror]
+        logger.info(f"Evicted mirror {mirror} ({sizes[mirror]} bytes)")
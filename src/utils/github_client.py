@@ -0,0 +1,85 @@
+import threading
+import time
+from typing import Any, Callable, Optional
+
+import github
+from github.Branch import Branch
+from github.Repository import Repository
+from loguru import logger
+
+from src.config import SETTINGS
+
+_clients: dict[str, github.Github] = {}
+_cache: dict[tuple, tuple[Any, float]] = {}
+_lock = threading.Lock()
+
+
+def get_github(github_token: str) -> github.Github:
+    """Return the shared GitHub client for ``github_token``."""
+    with _lock:
+        client = _clients.get(github_token)
+        if client is None:
+            client = github.Github(github_token)
+            _clients[github_token] = client
+        return client
+
+
+def _cached(
+    key: tuple,
+    load: Callable[[], Any],
+    revalidate: Optional[Callable[[Any], Any]] = None,
+) -> Any:
+    """Return the cached value for ``key``, loading or revalidating it once its TTL expires.
+
+    ``revalidate`` refreshes an expired value in place with a conditional request, so an
+    unchanged object costs a 304 response that does not count against the rate limit.
+    """
+    with _lock:
+        entry = _cache.get(key)
+
+    if entry is not None:
+        value, fetched_at = entry
+        if time.monotonic() - fetched_at < SETTINGS.github_cache_ttl:
+            return value
+
+        if revalidate is not None:
+            try:
+                changed = revalidate(value)
+                state = "changed" if changed else "not modified"
+                logger.debug(f"Revalidated cached GitHub {key[0]} {key[2:]}: {state}")
+                with _lock:
+                    _cache[key] = (value, time.monotonic())
+                return value
+            except github.GithubException as e:
+                logger.warning(f"Failed to revalidate GitHub {key[0]} {key[2:]}, reloading: {e}")
+
+    value = load()
+    with _lock:
+        _cache[key] = (value, time.monotonic())
+    return value
+
+
+def get_repo(github_token: str, full_name: str) -> Repository:
+    g = get_github(github_token)
+    return _cached(
+        ("repo", github_token, full_name),
+        lambda: g.get_repo(full_name),
+        lambda repo: repo.update(),
+    )
+
+
+def get_user_login(github_token: str) -> str:
+    g = get_github(github_token)
+    return _cached(("login", github_token), lambda: g.get_user().login)
+
+
+def get_branch(github_token: str, full_name: str, branch: str) -> Branch:
+    repo = get_repo(github_token, full_name)
+    return _cached(("branch", github_token, full_name, branch), lambda: repo.get_branch(branch))
+
+
+def invalidate(github_token: str, full_name: str) -> None:
+    """Drop every cached entry of the repository ``full_name``."""
+    with _lock:
+        for key in [key for key in _cache if key[1:3] == (github_token, full_name)]:
+            del _cache[key]
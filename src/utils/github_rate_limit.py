@@ -0,0 +1,185 @@
+import functools
+import hashlib
+import inspect
+import os
+import sqlite3
+import time
+from contextlib import closing
+from pathlib import Path
+from typing import Callable, Mapping, Optional
+
+import github
+from loguru import logger
+
+from src.config import SETTINGS
+from src.enums import RequestPriority
+
+from .github_client import get_github
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS github_rate_limit (
+    token_id TEXT PRIMARY KEY,
+    remaining INTEGER,
+    reset_at REAL NOT NULL DEFAULT 0,
+    blocked_until REAL NOT NULL DEFAULT 0,
+    updated_at REAL NOT NULL
+)
+"""
+
+
+def _token_id(github_token: str) -> str:
+    return hashlib.sha256(github_token.encode()).hexdigest()[:16]
+
+
+def _connect() -> sqlite3.Connection:
+    path = Path(os.path.expanduser(SETTINGS.github_rate_limit_db))
+    path.parent.mkdir(parents=True, exist_ok=True)
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None)
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute(_SCHEMA)
+    return conn
+
+
+def acquire(
+    github_token: str,
+    priority: RequestPriority = RequestPriority.high,
+    cost: int = 1,
+    block: bool = True,
+) -> bool:
+    """Take ``cost`` requests from the budget shared by every process using ``github_token``.
+
+    High priority requests only wait when GitHub has blocked the token or the budget is spent.
+    Low priority requests also leave ``github_low_priority_reserve`` requests untouched, so
+    polling backs off well before the solve path runs out of budget. Returns False instead of
+    waiting when ``block`` is False.
+    """
+    token_id = _token_id(github_token)
+    reserve = SETTINGS.github_low_priority_reserve if priority == RequestPriority.low else 0
+
+    while True:
+        with closing(_connect()) as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT remaining, reset_at, blocked_until FROM github_rate_limit"
+                " WHERE token_id = ?",
+                (token_id,),
+            ).fetchone()
+            now = time.time()
+
+            wait = 0.0
+            if row is not None:
+                remaining, reset_at, blocked_until = row
+                if blocked_until > now:
+                    wait = blocked_until - now
+                elif remaining is not None and reset_at > now and remaining - cost < reserve:
+                    wait = reset_at - now
+
+            if not wait:
+                conn.execute(
+                    "INSERT INTO github_rate_limit (token_id, updated_at) VALUES (?, ?)"
+                    " ON CONFLICT(token_id) DO UPDATE SET"
+                    " remaining = CASE WHEN reset_at > excluded.updated_at"
+                    " THEN remaining - ? ELSE NULL END,"
+                    " updated_at = excluded.updated_at",
+                    (token_id, now, cost),
+                )
+                conn.execute("COMMIT")
+                return True
+            conn.execute("COMMIT")
+
+        if not block:
+            logger.info(f"GitHub budget exhausted, skipping {priority.value} priority request")
+            return False
+
+        logger.warning(f"GitHub budget exhausted, delaying {priority.value} request {wait:.0f}s")
+        time.sleep(min(wait, SETTINGS.github_rate_limit_max_sleep))
+
+
+def record(
+    github_token: str,
+    remaining: Optional[int],
+    reset_at: Optional[float],
+    retry_after: Optional[float] = None,
+) -> None:
+    """Store the budget reported by GitHub so that every process sees it.
+
+    Reports can arrive late or from a client that has not talked to GitHub for a while, so a
+    report only replaces the stored budget for a newer reset window and otherwise can only
+    lower it.
+    """
+    now = time.time()
+    blocked_until = now + retry_after if retry_after else 0.0
+    with closing(_connect()) as conn:
+        conn.execute(
+            "INSERT INTO github_rate_limit"
+            " (token_id, remaining, reset_at, blocked_until, updated_at)"
+            " VALUES (?, ?, ?, ?, ?)"
+            " ON CONFLICT(token_id) DO UPDATE SET"
+            " remaining = CASE"
+            " WHEN excluded.reset_at > reset_at THEN excluded.remaining"
+            " WHEN excluded.reset_at < reset_at OR excluded.remaining IS NULL THEN remaining"
+            " ELSE MIN(COALESCE(remaining, excluded.remaining), excluded.remaining) END,"
+            " reset_at = MAX(reset_at, excluded.reset_at),"
+            " blocked_until = MAX(blocked_until, excluded.blocked_until),"
+            " updated_at = excluded.updated_at",
+            (_token_id(github_token), remaining, reset_at or 0.0, blocked_until, now),
+        )
+
+
+def record_from_headers(github_token: str, headers: Optional[Mapping[str, str]]) -> None:
+    if not headers:
+        return
+    headers = {key.lower(): value for key, value in headers.items()}
+    remaining = headers.get("x-ratelimit-remaining")
+    reset_at = headers.get("x-ratelimit-reset")
+    retry_after = headers.get("retry-after")
+    if remaining is None and retry_after is None:
+        return
+
+    if retry_after is None and remaining == "0" and reset_at is not None:
+        retry_after = float(reset_at) - time.time()
+    record(
+        github_token,
+        int(remaining) if remaining is not None else None,
+        float(reset_at) if reset_at is not None else None,
+        float(retry_after) if retry_after is not None else None,
+    )
+
+
+def _record_from_client(github_token: str) -> None:
+    g = get_github(github_token)
+    remaining, _ = g.rate_limiting
+    record(github_token, remaining, g.rate_limiting_resettime)
+
+
+def rate_limited(priority: RequestPriority = RequestPriority.high, block: bool = True) -> Callable:
+    """Schedule a function taking a ``github_token`` argument against the shared budget.
+
+    The function is retried when GitHub rejects it with a rate limit, after the scheduler has
+    waited for the time GitHub asked for. When ``block`` is False the call is skipped and None
+    returned instead of waiting, for callers that run on a shared thread pool.
+    """
+
+    def decorator(fn: Callable) -> Callable:
+        signature = inspect.signature(fn)
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            github_token = signature.bind_partial(*args, **kwargs).arguments["github_token"]
+            for attempt in range(1, SETTINGS.github_rate_limit_retries + 1):
+                if not acquire(github_token, priority, block=block):
+                    return None
+                try:
+                    result = fn(*args, **kwargs)
+                except github.RateLimitExceededException as e:
+                    record_from_headers(github_token, e.headers)
+                    if attempt == SETTINGS.github_rate_limit_retries:
+                        raise
+                    logger.warning(f"{fn.__name__} hit the GitHub rate limit, retrying")
+                    continue
+                _record_from_client(github_token)
+                return result
+
+        return wrapper
+
+    return decorator
@@ -0,0 +1,114 @@
+import hashlib
+import json
+import os
+import tempfile
+import threading
+from pathlib import Path
+from typing import Any, Callable, Optional
+
+import openai
+from loguru import logger
+
+from src.config import SETTINGS
+
+_lock = threading.Lock()
+_stats = {"hits": 0, "misses": 0}
+_size: Optional[int] = None
+
+
+def _cache_root() -> Path:
+    return Path(os.path.expanduser(SETTINGS.llm_cache_dir))
+
+
+def _cache_key(model: str, messages: list[dict]) -> str:
+    payload = json.dumps({"model": model, "messages": messages}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+def _cache_files() -> list[tuple[str, os.stat_result]]:
+    entries = []
+    for root, _, files in os.walk(_cache_root()):
+        for name in files:
+            path = os.path.join(root, name)
+            try:
+                entries.append((path, os.stat(path)))
+            except OSError:
+                pass
+    return entries
+
+
+def _evict() -> None:
+    """Delete least recently used entries until the cache fits in its size budget."""
+    global _size
+    entries = sorted(_cache_files(), key=lambda entry: entry[1].st_mtime)
+    _size = sum(stat.st_size for _, stat in entries)
+    for path, stat in entries:
+        if _size <= SETTINGS.llm_cache_max_bytes:
+            break
+        try:
+            os.remove(path)
+        except OSError:
+            continue
+        _size -= stat.st_size
+
+
+def _store(path: Path, content: str) -> None:
+    global _size
+    path.parent.mkdir(parents=True, exist_ok=True)
+    data = json.dumps({"content": content}).encode()
+    with tempfile.NamedTemporaryFile(dir=path.parent, delete=False) as tmp:
+        tmp.write(data)
+    os.replace(tmp.name, path)
+
+    with _lock:
+        if _size is None:
+            _evict()
+        else:
+            _size += len(data)
+            if _size > SETTINGS.llm_cache_max_bytes:
+                _evict()
+
+
+def cached_completion(
+    model: str,
+    messages: list[dict],
+    create: Optional[Callable[..., Any]] = None,
+    bypass: bool = False,
+) -> str:
+    """Return the stripped content of a chat completion, served from disk when possible.
+
+    Entries are keyed by a hash of the model and messages. ``create`` defaults to the module
+    level OpenAI client; ``bypass`` always calls the model and leaves the cache untouched.
+    """
+    create = create or openai.chat.completions.create
+    if bypass or not SETTINGS.llm_cache_enabled:
+        return create(model=model, messages=messages).choices[0].message.content.strip()
+
+    key = _cache_key(model, messages)
+    path = _cache_root() / key[:2] / f"{key}.json"
+    try:
+        content = json.loads(path.read_text())["content"]
+    except FileNotFoundError:
+        pass
+    except (OSError, ValueError, KeyError) as e:
+        logger.warning(f"Ignoring unreadable LLM cache entry {path}: {e}")
+    else:
+        os.utime(path)
+        with _lock:
+            _stats["hits"] += 1
+        logger.debug(f"LLM cache hit for {model} ({key[:12]})")
+        return content
+
+    with _lock:
+        _stats["misses"] += 1
+    content = create(model=model, messages=messages).choices[0].message.content.strip()
+    try:
+        _store(path, content)
+    except OSError as e:
+        logger.warning(f"Failed to write LLM cache entry {path}: {e}")
+    return content
+
+
+def cache_stats() -> dict[str, int]:
+    with _lock:
+        return dict(_stats)
@@ -0,0 +1,72 @@
+import asyncio
+import importlib.util
+import threading
+import weakref
+
+import httpx
+from loguru import logger
+
+from src.config import SETTINGS
+
+_client: httpx.Client | None = None
+_client_lock = threading.Lock()
+_async_clients: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, httpx.AsyncClient]" = (
+    weakref.WeakKeyDictionary()
+)
+
+
+def _client_kwargs() -> dict:
+    http2 = SETTINGS.market_http2
+    if http2 and importlib.util.find_spec("h2") is None:
+        logger.warning(
+            "HTTP/2 requested for the market API but h2 is not installed, using HTTP/1.1"
+        )
+        http2 = False
+
+    return {
+        "base_url": SETTINGS.market_url,
+        "headers": {
+            "x-api-key": SETTINGS.market_api_key,
+            "Accept": "application/json",
+        },
+        "timeout": httpx.Timeout(SETTINGS.market_timeout),
+        "limits": httpx.Limits(
+            max_connections=SETTINGS.market_max_connections,
+            max_keepalive_connections=SETTINGS.market_max_connections,
+            keepalive_expiry=SETTINGS.market_keepalive_expiry,
+        ),
+        "http2": http2,
+    }
+
+
+def get_client() -> httpx.Client:
+    """Return the process-wide market API client, creating it on first use."""
+    global _client
+    with _client_lock:
+        if _client is None or _client.is_closed:
+            _client = httpx.Client(**_client_kwargs())
+        return _client
+
+
+def get_async_client() -> httpx.AsyncClient:
+    """Return the market API client bound to the running event loop."""
+    loop = asyncio.get_running_loop()
+    client = _async_clients.get(loop)
+    if client is None or client.is_closed:
+        client = httpx.AsyncClient(**_client_kwargs())
+        _async_clients[loop] = client
+    return client
+
+
+def close_client() -> None:
+    global _client
+    with _client_lock:
+        if _client is not None:
+            _client.close()
+            _client = None
+
+
+async def aclose_async_client() -> None:
+    client = _async_clients.pop(asyncio.get_running_loop(), None)
+    if client is not None:
+        await client.aclose()
@@ -0,0 +1,182 @@
+import fnmatch
+import os
+import re
+from dataclasses import dataclass
+from datetime import datetime
+from typing import Optional
+
+from src.config import SETTINGS
+
+from .tokens import count_tokens, split_by_tokens
+
+# Diffs of these files are machine written and rarely worth reading line by line.
+_GENERATED_FILES = {
+    "package-lock.json",
+    "npm-shrinkwrap.json",
+    "yarn.lock",
+    "pnpm-lock.yaml",
+    "poetry.lock",
+    "Pipfile.lock",
+    "uv.lock",
+    "Cargo.lock",
+    "Gemfile.lock",
+    "composer.lock",
+    "go.sum",
+    "mix.lock",
+    "pubspec.lock",
+}
+_GENERATED_PATTERNS = (
+    "*.min.js",
+    "*.min.css",
+    "*.map",
+    "*.snap",
+    "*_pb2.py",
+    "*_pb2_grpc.py",
+    "*.pb.go",
+    "*.generated.*",
+    "*.g.dart",
+    "dist/*",
+    "build/*",
+    "vendor/*",
+    "node_modules/*",
+)
+_WORD = re.compile(r"[A-Za-z0-9_]{3,}")
+
+
+@dataclass
+class PrFile:
+    filename: str
+    status: str
+    additions: int
+    deletions: int
+    patch: Optional[str]
+
+
+@dataclass
+class PrComment:
+    created_at: datetime
+    author: str
+    text: str
+    path: Optional[str] = None
+
+
+def is_generated(filename: str) -> bool:
+    """Whether ``filename`` is a lockfile or another file that is usually generated."""
+    if os.path.basename(filename) in _GENERATED_FILES:
+        return True
+    return any(
+        fnmatch.fnmatch(filename, pattern) or fnmatch.fnmatch(filename, f"*/{pattern}")
+        for pattern in _GENERATED_PATTERNS
+    )
+
+
+def _relevance(file: PrFile, latest_comment: Optional[PrComment]) -> float:
+    if latest_comment is None:
+        return 0.0
+
+    score = 0.0
+    if latest_comment.path == file.filename:
+        score += 100
+    if file.filename in latest_comment.text:
+        score += 50
+    elif os.path.basename(file.filename) in latest_comment.text:
+        score += 20
+
+    comment_words = {word.lower() for word in _WORD.findall(latest_comment.text)}
+    path_words = {word.lower() for word in _WORD.findall(file.filename)}
+    return score + 5 * len(comment_words & path_words)
+
+
+def _file_header(file: PrFile) -> str:
+    return "\n".join(
+        [
+            f"File: {file.filename}",
+            f"Status: {file.status}",
+            f"Changes: +{file.additions} -{file.deletions}",
+        ]
+    )
+
+
+def _capped_patch(patch: str, max_tokens: int) -> str:
+    head = next(split_by_tokens(patch, max_tokens), "")
+    if len(head) == len(patch):
+        return patch
+    omitted = len(patch[len(head) :].splitlines())
+    return f"{head.rstrip()}\n... {omitted} more lines truncated"
+
+
+def _format_file(file: PrFile, max_tokens: int) -> str:
+    if is_generated(file.filename):
+        return f"{_file_header(file)}\nPatch: omitted, generated file\n"
+    if not file.patch:
+        return f"{_file_header(file)}\nPatch:\nNo patch available\n"
+    return f"{_file_header(file)}\nPatch:\n{_capped_patch(file.patch, max_tokens)}\n"
+
+
+def build_pr_context(
+    files: list[PrFile],
+    issue_comments: list[PrComment],
+    review_comments: list[PrComment],
+    token_budget: Optional[int] = None,
+    file_token_cap: Optional[int] = None,
+) -> str:
+    """Render the diff and comments of a PR for the agent within ``token_budget`` tokens.
+
+    Comments are kept newest first, up to half of the budget. The diff gets the rest: files are
+    ordered by their relevance to the newest comment, each patch is cut at ``file_token_cap``
+    tokens and lockfiles or generated files are reduced to their change counts. Files that no
+    longer fit are listed by name only.
+    """
+    token_budget = token_budget or SETTINGS.pr_context_token_budget
+    file_token_cap = file_token_cap or SETTINGS.pr_context_file_token_cap
+
+    latest_comment = max(
+        issue_comments + review_comments, key=lambda comment: comment.created_at, default=None
+    )
+
+    kept: set[int] = set()
+    comments_tokens = 0
+    for comment in sorted(
+        issue_comments + review_comments, key=lambda comment: comment.created_at, reverse=True
+    ):
+        tokens = count_tokens(comment.text)
+        if kept and comments_tokens + tokens > token_budget // 2:
+            break
+        kept.add(id(comment))
+        comments_tokens += tokens
+
+    comments = []
+    for comment in issue_comments + review_comments:
+        if id(comment) in kept:
+            comments.append(comment.text)
+            comments.append("---")
+    omitted_comments = len(issue_comments) + len(review_comments) - len(kept)
+    if omitted_comments:
+        comments.append(f"{omitted_comments} older comments omitted")
+
+    diff_budget = token_budget - comments_tokens
+    diff_text = []
+    omitted_files = []
+    ranked = sorted(
+        files,
+        key=lambda file: (-_relevance(file, latest_comment), file.additions + file.deletions),
+    )
+    for file in ranked:
+        formatted = _format_file(file, min(file_token_cap, max(diff_budget, 0)))
+        tokens = count_tokens(formatted)
+        if tokens > diff_budget:
+            omitted_files.append(f"{file.filename} (+{file.additions} -{file.deletions})")
+            continue
+        diff_text.append(formatted)
+        diff_budget -= tokens
+    if omitted_files:
+        diff_text.append("Files without their patch:\n" + "\n".join(omitted_files))
+
+    return "\n".join(
+        [
+            "DIFF",
+            "\n".join(diff_text),
+            "COMMENTS",
+            "\n".join(comments),
+        ]
+    )
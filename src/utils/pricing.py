@@ -1,10 +1,18 @@
 import json
+import os
+import re
+import tempfile
+import threading
+import time
 from dataclasses import dataclass
-from typing import Dict, Optional
+from pathlib import Path
+from typing import Dict, List, Optional
 
 import httpx
 from loguru import logger
 
+from src.config import SETTINGS
+
 
 @dataclass
 class ModelPricing:
@@ -13,36 +21,176 @@ class ModelPricing:
 
 
 DEFAULT_MODEL = "anthropic/claude-3.5-sonnet"
+OPENROUTER_MODELS_URL = "https://openrouter.ai/api/v1/models"
+
+# Names used by our LiteLLM proxy configuration that cannot be derived from OpenRouter ids.
+MODEL_ALIASES = {
+    "bedrock-claude-v2": "anthropic/claude-2",
+}
+_PROVIDER_PREFIXES = ("openrouter/", "bedrock/", "litellm/", "litellm_proxy/")
+_VERSION_SUFFIX = re.compile(r"-(\d{8}|v\d+)(\b.*)?$")
+
+
+def fetch_model_prices(openrouter_api_key: str) -> List[Dict]:
+    """Fetch current model prices from OpenRouter API."""
+    try:
+        with httpx.Client(timeout=30) as client:
+            response = client.get(
+                OPENROUTER_MODELS_URL,
+                headers={"Authorization": f"Bearer {openrouter_api_key}"},
+            )
+            response.raise_for_status()
+            data = response.json()
+            # OpenRouter API returns data in a 'data' field
+            return data.get("data", [])
+    except Exception as e:
+        logger.error(f"Error fetching model prices: {e}")
+        raise
+
+
+def _alias_key(model_id: str) -> str:
+    """Reduce a model id to the name shared by OpenRouter, Bedrock and LiteLLM spellings.
+
+    ``anthropic/claude-3.5-sonnet`` and ``bedrock/anthropic.claude-3-5-sonnet-20241022-v2:0``
+    both become ``claude-3-5-sonnet``.
+    """
+    model_id = model_id.lower()
+    for prefix in _PROVIDER_PREFIXES:
+        model_id = model_id.removeprefix(prefix)
+    model_id = model_id.rsplit("/", 1)[-1]
+    vendor, dot, name = model_id.partition(".")
+    if dot and not vendor[-1:].isdigit():
+        model_id = name
+    return _VERSION_SUFFIX.sub("", model_id).replace(".", "-")
 
 
 class PricingStrategy:
     def __init__(self, openrouter_api_key: str):
         self.openrouter_api_key = openrouter_api_key
         self._model_prices: Dict[str, ModelPricing] = {}
+        self._aliases: Dict[str, str] = {}
+        self._prices_lock = threading.Lock()
+        self._refresher_started = threading.Event()
         self._current_bid: float = 0.03
         self._backoff_factor: float = 0.8
         self._increase_factor: float = 1.2
         self._min_bid: float = 0.03
         self._max_bid: float = 0.03
         self._last_profitable: bool = False
+        self._load_snapshot()
 
-    def update_model_prices(self, models_data: list) -> None:
-        """Update model prices from provided OpenRouter API data."""
-        self._model_prices.clear()
+    @staticmethod
+    def _snapshot_path() -> Path:
+        return Path(os.path.expanduser(SETTINGS.model_prices_snapshot))
+
+    def _load_snapshot(self) -> None:
+        try:
+            models_data = json.loads(self._snapshot_path().read_text())
+        except FileNotFoundError:
+            return
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable model price snapshot: {e}")
+            return
+        self._set_model_prices(models_data)
+        logger.info(f"Loaded {len(self._model_prices)} model prices from snapshot")
+
+    def _save_snapshot(self, models_data: list) -> None:
+        path = self._snapshot_path()
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            with tempfile.NamedTemporaryFile("w", dir=path.parent, delete=False) as tmp:
+                json.dump(models_data, tmp)
+            os.replace(tmp.name, path)
+        except OSError as e:
+            logger.warning(f"Failed to write model price snapshot: {e}")
+
+    def _set_model_prices(self, models_data: list) -> None:
+        model_prices = {}
+        aliases = {}
         for model in models_data:
-            self._model_prices[model["id"]] = ModelPricing(
+            model_prices[model["id"]] = ModelPricing(
                 input_price_per_token=model.get("pricing", {}).get("prompt", 0),
                 output_price_per_token=model.get("pricing", {}).get("completion", 0),
             )
+            aliases.setdefault(_alias_key(model["id"]), model["id"])
+        for alias, model_id in {**MODEL_ALIASES, **SETTINGS.model_price_aliases}.items():
+            if model_id in model_prices:
+                aliases[alias] = model_id
+
+        with self._prices_lock:
+            self._model_prices = model_prices
+            self._aliases = aliases
+
+    def update_model_prices(self, models_data: list) -> None:
+        """Update model prices from provided OpenRouter API data."""
+        if not models_data:
+            logger.warning("Received no model prices, keeping the current table")
+            return
+        models_data = [
+            {"id": model["id"], "pricing": model.get("pricing", {})} for model in models_data
+        ]
+        self._set_model_prices(models_data)
+        self._save_snapshot(models_data)
         logger.info("Successfully updated model prices")
 
+    def refresh_model_prices(self) -> None:
+        """Fetch model prices from OpenRouter, keeping the current table on failure."""
+        try:
+            self.update_model_prices(fetch_model_prices(self.openrouter_api_key))
+        except Exception as e:
+            logger.error(f"Failed to refresh model prices: {e}")
+
+    def _refresh_periodically(self) -> None:
+        try:
+            age = time.time() - self._snapshot_path().stat().st_mtime
+        except OSError:
+            age = float("inf")
+        if age < SETTINGS.model_prices_ttl:
+            time.sleep(SETTINGS.model_prices_ttl - age)
+
+        while True:
+            self.refresh_model_prices()
+            time.sleep(SETTINGS.model_prices_ttl)
+
+    def start_refresher(self) -> None:
+        """Refresh model prices in the background once the snapshot is older than the TTL.
+
+        Without a snapshot the prices are fetched once before returning, so that the first
+        solves are not priced from an empty table.
+        """
+        if self._refresher_started.is_set():
+            return
+        self._refresher_started.set()
+        with self._prices_lock:
+            has_prices = bool(self._model_prices)
+        if not has_prices:
+            logger.info("No model price snapshot, fetching model prices")
+            self.refresh_model_prices()
+        threading.Thread(
+            target=self._refresh_periodically, name="model-price-refresher", daemon=True
+        ).start()
+
+    def _resolve_model(self, model_id: str) -> Optional[str]:
+        with self._prices_lock:
+            if model_id in self._model_prices:
+                return model_id
+            return self._aliases.get(model_id) or self._aliases.get(_alias_key(model_id))
+
     def estimate_cost(self, model_id: str, input_tokens: int, output_tokens: int) -> float:
-        """Estimate the cost for a given model and token usage."""
-        if model_id not in self._model_prices:
+        """Estimate the cost for a given model and token usage.
+
+        Raises RuntimeError when neither the model nor the default model has a price, rather
+        than pricing the usage at nothing.
+        """
+        resolved_model_id = self._resolve_model(model_id)
+        if resolved_model_id is None:
             logger.warning(f"No pricing information for model {model_id}")
-            model_id = DEFAULT_MODEL
+            resolved_model_id = DEFAULT_MODEL
 
-        pricing = self._model_prices[model_id]
+        with self._prices_lock:
+            pricing = self._model_prices.get(resolved_model_id)
+        if pricing is None:
+            raise RuntimeError(f"No model prices available to price {model_id}")
         return input_tokens * float(pricing.input_price_per_token) + output_tokens * float(
             pricing.output_price_per_token
         )
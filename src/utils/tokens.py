@@ -0,0 +1,61 @@
+from functools import lru_cache
+from typing import Iterator, Optional
+
+from loguru import logger
+
+try:
+    import tiktoken
+except ImportError:  # pragma: no cover - tiktoken ships with litellm
+    tiktoken = None
+
+_CHARS_PER_TOKEN = 4
+
+
+@lru_cache(maxsize=None)
+def _encoding(model: str) -> Optional[object]:
+    if tiktoken is None:
+        logger.warning("tiktoken is not installed, estimating tokens from characters")
+        return None
+    try:
+        return tiktoken.encoding_for_model(model)
+    except KeyError:
+        return tiktoken.get_encoding("o200k_base")
+    except Exception as e:
+        logger.warning(f"Failed to load the tokenizer for {model}, estimating tokens: {e}")
+        return None
+
+
+def count_tokens(text: str, model: str = "gpt-4o-mini") -> int:
+    """Count the tokens ``model`` sees in ``text``, estimated when no tokenizer is available."""
+    encoding = _encoding(model)
+    if encoding is None:
+        return len(text) // _CHARS_PER_TOKEN
+    return len(encoding.encode(text, disallowed_special=()))
+
+
+def split_by_tokens(text: str, max_tokens: int, model: str = "gpt-4o-mini") -> Iterator[str]:
+    """Split ``text`` on line boundaries into chunks of at most ``max_tokens`` tokens.
+
+    Lines longer than the budget are cut on their own.
+    """
+    chunk: list[str] = []
+    chunk_tokens = 0
+    for line in text.splitlines(keepends=True):
+        line_tokens = count_tokens(line, model)
+        if line_tokens > max_tokens:
+            if chunk:
+                yield "".join(chunk)
+                chunk, chunk_tokens = [], 0
+            step = max(max_tokens * _CHARS_PER_TOKEN // 2, 1)
+            for start in range(0, len(line), step):
+                yield line[start : start + step]
+            continue
+
+        if chunk_tokens + line_tokens > max_tokens:
+            yield "".join(chunk)
+            chunk, chunk_tokens = [], 0
+        chunk.append(line)
+        chunk_tokens += line_tokens
+
+    if chunk:
+        yield "".join(chunk)
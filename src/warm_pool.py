@@ -0,0 +1,110 @@
+import os
+import queue
+import shutil
+import tempfile
+import threading
+import uuid
+from contextlib import contextmanager
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterator, Optional
+
+from loguru import logger
+
+from src.config import SETTINGS
+from src.containers import reap_containers, start_idle_container
+
+
+@dataclass
+class WarmSlot:
+    container: object
+    workspace: Path
+
+
+class WarmContainerPool:
+    """Pre-started idle agent containers, each with an empty workspace already mounted.
+
+    A solve clones its repository into the workspace of a slot and executes the agent inside
+    the slot's container, so it skips container creation and startup. Slots are used once:
+    on release the container is removed, the workspace deleted and a new slot started in the
+    background.
+    """
+
+    def __init__(self, size: int, container_kwargs: Callable[[str], dict]):
+        self._size = size
+        self._container_kwargs = container_kwargs
+        self._slots: queue.Queue[WarmSlot] = queue.Queue()
+        self._root = Path(os.path.expanduser(SETTINGS.warm_pool_dir))
+        self._closed = False
+
+    def _start_slot(self) -> None:
+        if self._closed:
+            return
+        workspace = self._root / uuid.uuid4().hex
+        try:
+            workspace.mkdir(parents=True)
+            container = start_idle_container(**self._container_kwargs(str(workspace)))
+        except Exception as e:
+            logger.error(f"Failed to start warm container: {e}")
+            shutil.rmtree(workspace, ignore_errors=True)
+            return
+        self._slots.put(WarmSlot(container=container, workspace=workspace))
+        logger.info(f"Warm container {container.name} ready")
+
+    def _start_slot_in_background(self) -> None:
+        threading.Thread(target=self._start_slot, name="warm-pool-slot", daemon=True).start()
+
+    def start(self) -> None:
+        if self._size:
+            logger.info(f"Starting {self._size} warm containers")
+        for _ in range(self._size):
+            self._start_slot_in_background()
+
+    def acquire(self) -> Optional[WarmSlot]:
+        """Take a running warm slot, or None if none is ready."""
+        while not self._closed:
+            try:
+                slot = self._slots.get_nowait()
+            except queue.Empty:
+                return None
+
+            try:
+                slot.container.reload()
+                if slot.container.status == "running":
+                    return slot
+            except Exception as e:
+                logger.warning(f"Discarding unusable warm container: {e}")
+            self.release(slot)
+        return None
+
+    def release(self, slot: WarmSlot) -> None:
+        reap_containers([slot.container])
+        shutil.rmtree(slot.workspace, ignore_errors=True)
+        self._start_slot_in_background()
+
+    def shutdown(self) -> None:
+        self._closed = True
+        slots = []
+        while True:
+            try:
+                slots.append(self._slots.get_nowait())
+            except queue.Empty:
+                break
+        reap_containers([slot.container for slot in slots])
+        for slot in slots:
+            shutil.rmtree(slot.workspace, ignore_errors=True)
+
+
+@contextmanager
+def solve_workspace(pool: WarmContainerPool) -> Iterator[tuple[str, Optional[object]]]:
+    """Yield a workspace directory and the warm container mounting it, if one is available."""
+    slot = pool.acquire()
+    if slot is None:
+        with tempfile.TemporaryDirectory() as temp_dir:
+            yield temp_dir, None
+        return
+
+    try:
+        yield str(slot.workspace), slot.container
+    finally:
+        pool.release(slot)
@@ -0,0 +1,155 @@
+import itertools
+import threading
+from dataclasses import dataclass, replace
+from datetime import datetime
+from typing import Any, Callable, Optional, Union
+
+from loguru import logger
+
+
+@dataclass
+class WorkerStatus:
+    name: str
+    instance_id: Optional[str] = None
+    started_at: Optional[datetime] = None
+    completed: int = 0
+    failed: int = 0
+
+
+class SolveWorkerPool:
+    """Bounded pool of long-lived threads that solve instances in the background.
+
+    Instances are keyed by id so that an instance which is queued or being solved is never
+    submitted twice, even when it shows up again in a later solve cycle. Queued instances are
+    taken highest priority first, and in submission order among equal priorities. A priority
+    may be a function, which is evaluated whenever a worker takes the next instance, so that
+    scores growing with the waiting time take effect while an instance is queued.
+    """
+
+    def __init__(self, max_workers: int):
+        self._max_workers = max_workers
+        self._queued: list[tuple[Callable[[], float], int, tuple]] = []
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._work_available = threading.Condition(self._lock)
+        self._pending: set[str] = set()
+        self._workers: list[threading.Thread] = []
+        self._status: dict[str, WorkerStatus] = {}
+        self._shutting_down = False
+
+    def _start_workers(self) -> None:
+        for index in range(len(self._workers), self._max_workers):
+            name = f"solve-worker-{index}"
+            self._status[name] = WorkerStatus(name=name)
+            worker = threading.Thread(
+                target=self._run_worker, args=(name,), name=name, daemon=True
+            )
+            worker.start()
+            self._workers.append(worker)
+
+    def _take(self) -> Optional[tuple]:
+        """Wait for the queued item with the highest priority now, or None on shutdown."""
+        with self._work_available:
+            while not self._queued and not self._shutting_down:
+                self._work_available.wait()
+            if self._shutting_down:
+                return None
+            best = max(self._queued, key=lambda queued: (queued[0](), -queued[1]))
+            self._queued.remove(best)
+            return best[2]
+
+    def _run_worker(self, name: str) -> None:
+        while True:
+            item = self._take()
+            if item is None:
+                return
+
+            instance_id, fn, args = item
+            status = self._status[name]
+            with self._lock:
+                status.instance_id = instance_id
+                status.started_at = datetime.utcnow()
+
+            logger.info(f"{name} started solving instance id {instance_id}")
+            try:
+                fn(*args)
+            except Exception as e:
+                logger.exception(f"{name} failed solving instance id {instance_id}: {e}")
+                with self._lock:
+                    status.failed += 1
+            else:
+                logger.info(f"{name} finished solving instance id {instance_id}")
+                with self._lock:
+                    status.completed += 1
+            finally:
+                with self._lock:
+                    status.instance_id = None
+                    status.started_at = None
+                    self._pending.discard(instance_id)
+
+    def is_pending(self, instance_id: str) -> bool:
+        with self._lock:
+            return instance_id in self._pending
+
+    def submit(
+        self,
+        instance_id: str,
+        fn: Callable[..., Any],
+        *args: Any,
+        priority: Union[float, Callable[[], float]] = 0.0,
+    ) -> bool:
+        """Queue ``fn(*args)`` for ``instance_id``. Returns False if it is already pending."""
+        score = priority if callable(priority) else lambda: priority
+        with self._work_available:
+            if self._shutting_down:
+                logger.warning(f"Solve pool is shutting down, not queuing instance {instance_id}")
+                return False
+            if instance_id in self._pending:
+                return False
+            self._pending.add(instance_id)
+            self._start_workers()
+            self._queued.append((score, next(self._sequence), (instance_id, fn, args)))
+            self._work_available.notify()
+
+        logger.info(f"Queued instance id {instance_id} for solving with priority {score():.4f}")
+        return True
+
+    def status(self) -> list[WorkerStatus]:
+        with self._lock:
+            return [replace(status) for status in self._status.values()]
+
+    def log_status(self) -> None:
+        with self._lock:
+            queued = len(self._pending) - sum(
+                1 for status in self._status.values() if status.instance_id
+            )
+        for status in self.status():
+            if status.instance_id:
+                elapsed = (datetime.utcnow() - status.started_at).total_seconds()
+                state = f"solving {status.instance_id} for {elapsed:.0f}s"
+            else:
+                state = "idle"
+            logger.info(
+                f"{status.name}: {state} (completed: {status.completed}, failed: {status.failed})"
+            )
+        logger.info(f"{queued} instances queued for solving")
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Stop accepting work, drop queued instances and let running solves finish."""
+        with self._work_available:
+            if self._shutting_down:
+                return
+            self._shutting_down = True
+            dropped = len(self._queued)
+            for _, _, item in self._queued:
+                self._pending.discard(item[0])
+            self._queued.clear()
+            self._work_available.notify_all()
+        if dropped:
+            logger.info(f"Dropped {dropped} queued instances on shutdown")
+
+        if wait:
+            logger.info("Waiting for running solves to finish")
+            for worker in self._workers:
+                worker.join()
+            logger.info("All solve workers stopped")